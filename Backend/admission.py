@@ -0,0 +1,189 @@
+"""
+Admission control for the analyze endpoints.
+
+Each model ("object", "track") runs at most MAX_JOBS jobs at once. Requests
+beyond that wait in a priority queue, highest class first:
+
+    live       live safety feeds; may also use LIVE_RESERVE extra slots, so they
+               never wait behind a full pool of lower-priority jobs
+    standard   interactive uploads (default)
+    batch      bulk inspection uploads
+
+Each class has its own bounded queue (QUEUE_LIMITS). When it is full, the
+request gets 429 with a Retry-After header estimated from recent job times.
+Admission runs inside the endpoint, i.e. after Starlette has received the
+form and spooled the file to a temp file (priority is itself a form field);
+only the copy into UPLOAD_DIR and the inference wait for a slot. Oversized
+bodies are refused earlier, by uploads.UploadLimitMiddleware. In an endpoint:
+
+    async with admit("object", priority) as ticket:
+        ...
+        return {..., "admission": ticket.info()}
+"""
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, HTTPException
+
+from metrics import QUEUE_DEPTH, REGISTRY
+
+# ---------------- CONFIG ----------------
+PRIORITIES = ("live", "standard", "batch")  # highest first
+MAX_JOBS = {
+    "object": int(os.environ.get("SURAKSHA_MAX_JOBS_OBJECT", "1")),
+    "track": int(os.environ.get("SURAKSHA_MAX_JOBS_TRACK", "1")),
+}
+LIVE_RESERVE = int(os.environ.get("SURAKSHA_LIVE_RESERVE", "1"))
+QUEUE_LIMITS = {
+    "live": int(os.environ.get("SURAKSHA_QUEUE_LIVE", "4")),
+    "standard": int(os.environ.get("SURAKSHA_QUEUE_STANDARD", "8")),
+    "batch": int(os.environ.get("SURAKSHA_QUEUE_BATCH", "16")),
+}
+DEFAULT_JOB_SECONDS = 30.0  # wait estimate until a model has finished a job
+EWMA_ALPHA = 0.3
+
+QUEUE_WAIT = REGISTRY.histogram("suraksha_queue_wait_seconds", "Time a job waited for admission.",
+                                ("model", "priority"))
+REJECTED = REGISTRY.counter("suraksha_admission_rejected_total", "Requests rejected with 429 because the queue was full.",
+                            ("model", "priority"))
+QUEUED = REGISTRY.gauge("suraksha_admission_queued", "Jobs waiting for admission.", ("model", "priority"))
+
+router = APIRouter()
+
+
+class Ticket:
+    def __init__(self, model, priority, position, estimated_wait_s):
+        self.model = model
+        self.priority = priority
+        self.position = position   # jobs ahead in the queue on arrival
+        self.estimated_wait_s = estimated_wait_s
+        self.queued_s = 0.0
+
+    def info(self):
+        return {"model": self.model, "priority": self.priority, "position": self.position,
+                "estimated_wait_s": round(self.estimated_wait_s, 1), "queued_s": round(self.queued_s, 3)}
+
+
+class AdmissionController:
+    """
+    Concurrency cap plus per-priority bounded queue for one model. Used from
+    the event loop only, so it needs no locks; a slot is handed straight to
+    the next waiter when a job finishes.
+    """
+
+    def __init__(self, model, max_jobs, queue_limits=QUEUE_LIMITS, live_reserve=LIVE_RESERVE):
+        self.model = model
+        self.max_jobs = max(1, max_jobs)
+        self.queue_limits = dict(queue_limits)
+        self.live_reserve = live_reserve
+        self.running = 0
+        self._waiters = []   # heap of [rank, seq, future, priority]
+        self._seq = itertools.count()
+        self._avg_s = None   # EWMA of job durations
+        for priority in PRIORITIES:
+            QUEUED.set_function(lambda p=priority: self.queued(p), model=model, priority=priority)
+        QUEUE_DEPTH.set_function(lambda: self.running + len(self._waiters), queue=model)
+
+    def _limit(self, priority):
+        return self.max_jobs + (self.live_reserve if priority == "live" else 0)
+
+    def queued(self, priority=None):
+        return sum(1 for w in self._waiters if priority is None or w[3] == priority)
+
+    def job_seconds(self):
+        return self._avg_s if self._avg_s is not None else DEFAULT_JOB_SECONDS
+
+    def estimate_wait(self, priority):
+        """(jobs ahead, estimated seconds) for a request of `priority` arriving now."""
+        rank = PRIORITIES.index(priority)
+        ahead = sum(1 for w in self._waiters if w[0] <= rank)
+        free = self._limit(priority) - self.running
+        if ahead < free:
+            return ahead, 0.0
+        # every max_jobs jobs ahead of us cost about one average job
+        return ahead, math.ceil((ahead - free + 1) / self.max_jobs) * self.job_seconds()
+
+    def _dispatch(self):
+        while self._waiters and self.running < self._limit(self._waiters[0][3]):
+            _, _, fut, _ = heapq.heappop(self._waiters)
+            if fut.done():  # cancelled while queued
+                continue
+            self.running += 1
+            fut.set_result(None)
+
+    def _release(self, seconds=None):
+        self.running -= 1
+        if seconds is not None:
+            self._avg_s = seconds if self._avg_s is None else (1 - EWMA_ALPHA) * self._avg_s + EWMA_ALPHA * seconds
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority="standard"):
+        if priority not in PRIORITIES:
+            raise HTTPException(status_code=422, detail=f"priority must be one of {PRIORITIES}")
+        position, estimate = self.estimate_wait(priority)
+        if estimate > 0 and self.queued(priority) >= self.queue_limits[priority]:
+            REJECTED.inc(model=self.model, priority=priority)
+            raise HTTPException(status_code=429, detail=f"{self.model} queue is full for {priority} jobs, retry later",
+                                headers={"Retry-After": str(max(1, math.ceil(estimate)))})
+
+        ticket = Ticket(self.model, priority, position, estimate)
+        fut = asyncio.get_running_loop().create_future()
+        entry = [PRIORITIES.index(priority), next(self._seq), fut, priority]
+        heapq.heappush(self._waiters, entry)
+        t0 = time.perf_counter()
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release()  # slot was granted just as the client went away
+            else:
+                fut.cancel()
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+            raise
+        ticket.queued_s = time.perf_counter() - t0
+        QUEUE_WAIT.observe(ticket.queued_s, model=self.model, priority=priority)
+
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield ticket
+            ok = True
+        finally:
+            # failed jobs end early and would skew the estimate
+            self._release(time.perf_counter() - started if ok else None)
+
+    def state(self):
+        return {"running": self.running, "max_jobs": self.max_jobs, "live_reserve": self.live_reserve,
+                "avg_job_s": round(self.job_seconds(), 2),
+                "queues": {p: {"queued": self.queued(p), "limit": self.queue_limits[p],
+                               "estimated_wait_s": round(self.estimate_wait(p)[1], 1)} for p in PRIORITIES}}
+
+
+_controllers = {}
+
+
+def get_controller(model) -> AdmissionController:
+    ctl = _controllers.get(model)
+    if ctl is None:
+        ctl = _controllers[model] = AdmissionController(model, MAX_JOBS[model])
+    return ctl
+
+
+def admit(model, priority="standard"):
+    """Async context manager holding one of `model`'s job slots; raises 429 when the queue is full."""
+    return get_controller(model).slot(priority)
+
+
+@router.get("/admission")
+async def admission_state():
+    """Running jobs, queue lengths and current wait estimates per model and priority."""
+    return {model: get_controller(model).state() for model in MAX_JOBS}
@@ -0,0 +1,162 @@
+import os
+import re
+import gzip
+import uuid
+import shutil
+from pathlib import Path
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+import anyio
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, Response
+
+# ---------------- CONFIG ----------------
+CHUNK_SIZE = 1024 * 1024  # 1MB, only used when the server has no sendfile extension
+GZIP_LEVEL = 6
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeFileResponse(Response):
+    """206 response for one byte range of a file; uses the ASGI zero-copy (sendfile) extension when offered."""
+
+    def __init__(self, path: Path, start: int, end: int, size: int, media_type: str, headers: dict):
+        super().__init__(status_code=206, media_type=media_type, headers=headers)
+        self.path = path
+        self.start = start
+        self.count = end - start + 1
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method") == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send({"type": "http.response.zerocopysend", "file": f.fileno(),
+                            "offset": self.start, "count": self.count, "more_body": False})
+            return
+
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.start)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def _etag(st, suffix=""):
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}{suffix}"'
+
+
+def _not_modified(request: Request, etags, mtime: float) -> bool:
+    """True when the client's copy is current; `etags` are the ETags of every encoding of the file."""
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = [t.strip() for t in inm.split(",")]
+        return "*" in tags or any(e in tags or f"W/{e}" in tags for e in etags)
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _if_range_matches(if_range: str, etag: str, mtime: float) -> bool:
+    """If-Range holds an ETag or an HTTP date; a date only matches the exact Last-Modified second."""
+    if if_range.startswith(('"', "W/")):
+        return if_range == etag  # strong comparison, so a weak tag never matches
+    try:
+        return int(mtime) == int(parsedate_to_datetime(if_range).timestamp())
+    except (TypeError, ValueError):
+        return False
+
+
+def _parse_range(header: str, size: int):
+    """Return (start, end) for a single 'bytes=' range, None to ignore it, or raise 416."""
+    m = RANGE_RE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None  # multi-range or malformed: fall back to the full file
+    if m.group(1):
+        start = int(m.group(1))
+        end = int(m.group(2)) if m.group(2) else size - 1
+    else:
+        # suffix range: last N bytes
+        start = max(0, size - int(m.group(2)))
+        end = size - 1
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"},
+                            detail="Requested range not satisfiable")
+    return start, end
+
+
+def _gzip_variant(path: Path) -> Path:
+    """Create (or refresh) path.gz next to the artifact and return it."""
+    gz = path.with_name(path.name + ".gz")
+    if not gz.exists() or gz.stat().st_mtime < path.stat().st_mtime:
+        # own temp file per request: concurrent first requests each publish a complete variant
+        tmp = gz.with_name(f"{gz.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            with open(path, "rb") as src, gzip.open(tmp, "wb", compresslevel=GZIP_LEVEL) as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            os.replace(tmp, gz)
+        finally:
+            tmp.unlink(missing_ok=True)
+    return gz
+
+
+async def serve_artifact(request: Request, path: Path, media_type: str, filename: Optional[str] = None,
+                         compressible: bool = False, not_found: str = "Artifact not found") -> Response:
+    """
+    Serve an output file with ETag/Last-Modified revalidation, single byte-range (206)
+    requests and, for text artifacts, a cached pre-compressed gzip variant.
+    Full-file responses go through FileResponse so the server can sendfile them.
+    """
+    if not path.exists():
+        raise HTTPException(status_code=404, detail=not_found)
+    st = path.stat()
+    etag = _etag(st)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "no-cache",  # outputs are overwritten per run: always revalidate
+    }
+    if compressible:
+        headers["Vary"] = "Accept-Encoding"
+
+    # the encoding decides which ETag the client holds, so pick it before revalidating
+    use_gzip = compressible and "gzip" in request.headers.get("accept-encoding", "")
+    gz_etag = _etag(st, "-gz")
+    if _not_modified(request, (etag, gz_etag) if compressible else (etag,), st.st_mtime):
+        if use_gzip:
+            headers["ETag"] = gz_etag
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or _if_range_matches(if_range, etag, st.st_mtime)):
+        rng = _parse_range(range_header, st.st_size)
+        if rng is not None:
+            return RangeFileResponse(path, rng[0], rng[1], st.st_size, media_type, headers)
+
+    if use_gzip:
+        gz = await run_in_threadpool(_gzip_variant, path)
+        headers["ETag"] = gz_etag
+        headers["Content-Encoding"] = "gzip"
+        headers.pop("Accept-Ranges")  # ranges are only offered on the identity encoding
+        return FileResponse(gz, media_type=media_type, headers=headers, filename=filename)
+
+    return FileResponse(path, media_type=media_type, headers=headers, filename=filename)
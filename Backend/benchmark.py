@@ -0,0 +1,634 @@
+"""
+Reproducible benchmarks for the inference and simulation pipelines.
+
+Every case runs the real pipeline code (run_inference, run_inference_trackfault,
+the bulk mode, the network core and the Panda3D renderer) on synthetic inputs
+generated locally from a fixed seed, under a fixed configuration: thread count,
+plus FRAME_SKIP, BATCH_SIZE and IMG_SIZE for object detection, tiling for track
+videos and the batch size for bulk images. Each case runs in its own subprocess,
+so peak RSS is per case and module-level settings never leak between cases.
+Results (throughput, per-stage latency from the job timings, peak RSS) are saved
+as JSON and can be compared against a stored baseline; a throughput drop or RSS
+growth beyond the tolerance is reported as a regression and exits non-zero.
+
+Baselines are machine-specific, so none is committed: record one on the machine
+that will compare against it (--save-baseline without a path writes
+DEFAULT_BASELINE, which --baseline and compare read by default).
+
+Offline / CPU-only boxes use StandInModel (default), an OpenCV blob detector with
+the same call surface as the YOLO models, so the pipelines' own cost is measured.
+--model real uses the YOLO weights from Model/.
+
+    python benchmark.py run --suite quick --save-baseline               # record this machine's baseline
+    python benchmark.py run --suite quick --baseline                    # exit 1 on regression
+    python benchmark.py run --cases object_480p,sim_network_400 --save-baseline baseline.json
+    python benchmark.py compare bench.json                              # against DEFAULT_BASELINE
+    python benchmark.py compare bench.json baseline.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import zipfile
+import argparse
+import platform
+import resource
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+import cv2  # type: ignore
+import numpy as np  # type: ignore
+
+# ---------------- CONFIG ----------------
+BACKEND_DIR = Path(__file__).parent.resolve()
+DEFAULT_WORKDIR = Path(tempfile.gettempdir()) / "suraksha-bench"
+DEFAULT_BASELINE = BACKEND_DIR / "benchmark_baseline.json"
+FPS_TOLERANCE = 0.10   # relative throughput drop that counts as a regression
+RSS_TOLERANCE = 0.20   # relative peak-RSS growth that counts as a regression
+STAGE_NOISE_MS = 5.0   # stage slowdowns smaller than this (total per run) are not reported
+CASE_TIMEOUT_S = 1800
+SEED = 1234
+
+OBJECT_CLASSES = ["person", "car", "cow"]
+TRACK_CLASSES = ["track_fault", "rail"]
+# BGR colours the synthetic scenes draw each class in; StandInModel maps hue back to class
+CLASS_COLORS = {"person": (0, 0, 255), "car": (255, 0, 0), "cow": (0, 255, 255),
+                "track_fault": (255, 0, 255), "rail": (0, 255, 0)}
+
+_BASE = {"threads": 2}
+# only settings the pipeline's runner applies, so results never list one that had no effect
+_PIPELINE_CONFIG = {
+    "object": {"frame_skip": 2, "batch_size": 6, "img_size": 640, "render": False},
+    "track": {"render": False, "tiled": False},
+    "track_bulk": {"batch_size": 16},
+    "sim_network": {},
+    "sim_render": {},
+}
+
+
+def _case(name, pipeline, data=None, **config):
+    unknown = set(config) - set(_BASE) - set(_PIPELINE_CONFIG[pipeline])
+    if unknown:
+        raise ValueError(f"{name}: {pipeline} cases do not apply {sorted(unknown)}")
+    return {"name": name, "pipeline": pipeline, "data": data or {},
+            "config": {**_BASE, **_PIPELINE_CONFIG[pipeline], **config}}
+
+
+SUITES = {
+    "quick": [
+        _case("object_480p", "object", {"width": 854, "height": 480, "frames": 150, "objects": 3}),
+        _case("object_480p_b12_img416", "object", {"width": 854, "height": 480, "frames": 150, "objects": 3},
+              batch_size=12, img_size=416),
+        _case("object_720p_dense", "object", {"width": 1280, "height": 720, "frames": 150, "objects": 10}),
+        _case("object_480p_render", "object", {"width": 854, "height": 480, "frames": 150, "objects": 3},
+              render=True),
+        _case("track_480p", "track", {"width": 854, "height": 480, "frames": 100, "objects": 2}),
+        _case("track_1080p_tiled", "track", {"width": 1920, "height": 1080, "frames": 60, "objects": 2},
+              tiled=True),
+        _case("track_bulk_200", "track_bulk", {"width": 640, "height": 480, "images": 200, "objects": 1}),
+        _case("sim_network_400", "sim_network", {"n_tracks": 8, "n_trains": 400, "n_faults": 6, "n_obstacles": 6,
+                                                 "length_m": 40000.0, "max_seconds": 120.0}),
+        _case("sim_render_preview", "sim_render", {"quality": "preview"}),
+    ],
+}
+SUITES["full"] = SUITES["quick"] + [
+    _case("object_1080p", "object", {"width": 1920, "height": 1080, "frames": 150, "objects": 5}),
+    _case("object_480p_skip1", "object", {"width": 854, "height": 480, "frames": 150, "objects": 3}, frame_skip=1),
+    _case("object_480p_1thread", "object", {"width": 854, "height": 480, "frames": 150, "objects": 3}, threads=1),
+    _case("object_480p_4threads", "object", {"width": 854, "height": 480, "frames": 150, "objects": 3}, threads=4),
+    _case("track_720p", "track", {"width": 1280, "height": 720, "frames": 100, "objects": 4}),
+    _case("track_1080p", "track", {"width": 1920, "height": 1080, "frames": 60, "objects": 2}),
+    _case("track_4k_tiled", "track", {"width": 3840, "height": 2160, "frames": 30, "objects": 4}, tiled=True),
+    _case("track_bulk_1000", "track_bulk", {"width": 1280, "height": 720, "images": 1000, "objects": 2}),
+    _case("sim_network_5000", "sim_network", {"n_tracks": 16, "n_trains": 5000, "n_faults": 20, "n_obstacles": 20,
+                                              "length_m": 500000.0, "max_seconds": 60.0}),
+    _case("sim_render_standard", "sim_render", {"quality": "standard"}),
+]
+
+
+# =====================================================
+# Stand-in model
+# =====================================================
+class _Tensor:
+    """numpy-backed stand-in for the torch tensors an ultralytics result holds."""
+
+    def __init__(self, a):
+        self._a = np.asarray(a)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._a
+
+    def tolist(self):
+        return self._a.tolist()
+
+    def __getitem__(self, i):
+        return _Tensor(self._a[i])
+
+    def __len__(self):
+        return len(self._a)
+
+    def __int__(self):
+        return int(self._a.reshape(-1)[0])
+
+    def __float__(self):
+        return float(self._a.reshape(-1)[0])
+
+
+class _Boxes:
+    def __init__(self, xyxy, cls, conf):
+        self.xyxy = _Tensor(np.asarray(xyxy, dtype=np.float32).reshape(-1, 4))
+        self.cls = _Tensor(np.asarray(cls, dtype=np.float32))
+        self.conf = _Tensor(np.asarray(conf, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.cls)
+
+    def __iter__(self):
+        xyxy, cls, conf = self.xyxy.numpy(), self.cls.numpy(), self.conf.numpy()
+        for i in range(len(cls)):
+            yield _Boxes(xyxy[i:i + 1], cls[i:i + 1], conf[i:i + 1])
+
+
+class _Result:
+    def __init__(self, boxes, names):
+        self.boxes = boxes
+        self.names = names
+
+
+class StandInModel:
+    """
+    CPU stand-in for the YOLO models: finds saturated colour blobs and labels
+    them by hue. Supports model.predict(list) and model(img or list) like
+    ultralytics, with results exposing boxes.xyxy/cls/conf and names.
+    """
+
+    def __init__(self, classes):
+        self.names = dict(enumerate(classes))
+        hues = []
+        for name in classes:
+            bgr = np.uint8([[CLASS_COLORS[name]]])
+            hues.append(int(cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)[0, 0, 0]))
+        self._hues = np.array(hues)
+
+    def predict(self, source, conf=0.25, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        return [self._detect(img, conf) for img in images]
+
+    __call__ = predict
+
+    def _detect(self, img, min_conf):
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, (0, 150, 80), (179, 255, 255))
+        n, _, stats, centroids = cv2.connectedComponentsWithStats(mask)
+        xyxy, cls, conf = [], [], []
+        for i in range(1, n):
+            x, y, w, h, area = stats[i]
+            if area < 30:
+                continue
+            cx, cy = centroids[i]
+            hue = int(hsv[int(cy), int(cx), 0])
+            d = np.abs(self._hues - hue)
+            d = np.minimum(d, 180 - d)  # hue is circular
+            score = float(np.clip(area / (w * h), 0.0, 1.0)) * 0.95
+            if score < min_conf:
+                continue
+            xyxy.append([x, y, x + w, y + h])
+            cls.append(int(np.argmin(d)))
+            conf.append(score)
+        return _Result(_Boxes(xyxy, cls, conf), self.names)
+
+
+# =====================================================
+# Synthetic inputs
+# =====================================================
+def _scene(width, height, rng):
+    """Grey, low-saturation track scene: gradient, sensor noise and two converging rails."""
+    grad = np.linspace(90, 150, height, dtype=np.float32)[:, None]
+    base = np.repeat(grad, width, axis=1) + rng.normal(0, 6, (height, width)).astype(np.float32)
+    img = np.repeat(np.clip(base, 0, 255).astype(np.uint8)[:, :, None], 3, axis=2)
+    cx = width // 2
+    for side in (-1, 1):
+        cv2.line(img, (cx + side * width // 40, int(height * 0.35)), (cx + side * width // 5, height - 1),
+                 (220, 220, 220), max(2, width // 300))
+    return img
+
+
+def _objects(n, classes, rng):
+    return [{"cls": classes[i % len(classes)], "x": rng.uniform(0.35, 0.65), "y": rng.uniform(0.35, 0.9),
+             "speed": rng.uniform(0.002, 0.006), "size": rng.uniform(0.05, 0.09)} for i in range(n)]
+
+
+def _draw_objects(img, objects, classes):
+    h, w = img.shape[:2]
+    for ob in objects:
+        if ob["cls"] not in classes:
+            continue
+        # perspective: objects grow as they come closer (further down the frame)
+        s = ob["size"] * (0.5 + ob["y"])
+        bw, bh = int(w * s * 0.6), int(h * s * 1.2)
+        x, y = int(w * ob["x"]), int(h * ob["y"])
+        cv2.rectangle(img, (x - bw // 2, y - bh), (x + bw // 2, y), CLASS_COLORS[ob["cls"]], -1)
+
+
+def make_video(path, width, height, frames, objects, classes, seed=SEED, fps=25):
+    rng = np.random.default_rng(seed)
+    base = _scene(width, height, rng)
+    obs = _objects(objects, classes, rng)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    try:
+        for _ in range(frames):
+            img = base.copy()
+            _draw_objects(img, obs, classes)
+            writer.write(img)
+            for ob in obs:
+                ob["y"] += ob["speed"]
+                if ob["y"] > 0.98:
+                    ob["y"] = 0.4  # re-enter further away
+    finally:
+        writer.release()
+
+
+def make_image_zip(path, width, height, images, objects, classes, seed=SEED):
+    rng = np.random.default_rng(seed)
+    base = _scene(width, height, rng)
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for i in range(images):
+            img = base.copy()
+            # roughly every third photo shows a defect
+            if i % 3 == 0:
+                _draw_objects(img, _objects(objects, classes[:1], rng), classes)
+            ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            zf.writestr(f"site_{i // 50:02d}/img_{i:05d}.jpg", buf.tobytes())
+
+
+def prepare_inputs(case, workdir):
+    """Generate (or reuse) the synthetic input of a case; inputs are cached by their spec."""
+    data = case["data"]
+    if case["pipeline"] in ("sim_network", "sim_render"):
+        return None
+    spec = json.dumps({"pipeline": case["pipeline"], "data": data, "seed": SEED}, sort_keys=True)
+    digest = hashlib.sha256(spec.encode()).hexdigest()[:12]
+    inputs = Path(workdir) / "inputs"
+    inputs.mkdir(parents=True, exist_ok=True)
+    if case["pipeline"] == "track_bulk":
+        path = inputs / f"bulk-{digest}.zip"
+        if not path.exists():
+            tmp = path.with_suffix(".part")
+            make_image_zip(tmp, data["width"], data["height"], data["images"], data["objects"], TRACK_CLASSES)
+            os.replace(tmp, path)
+    else:
+        path = inputs / f"{case['pipeline']}-{digest}.mp4"
+        if not path.exists():
+            tmp = path.with_name(path.stem + ".part.mp4")
+            classes = OBJECT_CLASSES if case["pipeline"] == "object" else TRACK_CLASSES
+            make_video(tmp, data["width"], data["height"], data["frames"], data["objects"], classes)
+            os.replace(tmp, path)
+    return str(path)
+
+
+# =====================================================
+# Case runners (inside the per-case subprocess)
+# =====================================================
+def _use_model(module, classes, model_kind):
+    if model_kind == "standin":
+        module.set_model(StandInModel(classes))
+    else:
+        module.get_model()  # load the weights before timing
+
+
+def _run_object(case, input_path, out_dir, model_kind):
+    import inference_object
+    cfg = case["config"]
+    inference_object.FRAME_SKIP = cfg["frame_skip"]
+    inference_object.BATCH_SIZE = cfg["batch_size"]
+    inference_object.IMG_SIZE = cfg["img_size"]
+    _use_model(inference_object, OBJECT_CLASSES, model_kind)
+
+    def run():
+        res = inference_object.run_inference(input_path, 80.0, cfg.get("device", "cpu"), out_dir,
+                                             render=cfg["render"])
+        return res["timings"]["counts"].get("frames", 0), "frames", res["timings"]
+    return run
+
+
+def _run_track(case, input_path, out_dir, model_kind):
+    import inference_track
+    cfg = case["config"]
+    _use_model(inference_track, TRACK_CLASSES, model_kind)
+
+    def run():
+        res = inference_track.run_inference_trackfault(input_path, cfg.get("device", "cpu"), out_dir,
+                                                       render=cfg["render"], tiled=cfg["tiled"])
+        return res["timings"]["counts"].get("frames", 0), "frames", res["timings"]
+    return run
+
+
+def _run_track_bulk(case, input_path, out_dir, model_kind):
+    import inference_track
+    cfg = case["config"]
+    inference_track.BULK_BATCH_SIZE = cfg["batch_size"]
+    inference_track.DECODE_WORKERS = cfg["threads"]
+    _use_model(inference_track, TRACK_CLASSES, model_kind)
+
+    def run():
+        res = inference_track.run_inference_trackfault_bulk(input_path, cfg.get("device", "cpu"), out_dir)
+        return res["images"], "images", res["timings"]
+    return run
+
+
+def _run_sim_network(case, input_path, out_dir, model_kind):
+    from sim_network import run_network
+
+    def run():
+        res = run_network(**case["data"])
+        return res["summary"]["steps"], "steps", res["timings"]
+    return run
+
+
+def _run_sim_render(case, input_path, out_dir, model_kind):
+    from sim_engine import SimulationEngine
+    from sim_runtime import capture_settings
+    from train_fault_3dsimulation import TrainSafetyDemo
+
+    engine = SimulationEngine()  # startup is excluded; the service keeps one warm engine
+    capture = capture_settings(case["data"].get("quality", "preview"))
+    video = str(Path(out_dir) / "sim.mp4")
+
+    def run():
+        res = engine.run(TrainSafetyDemo(speed=12.0, fault_y=0.0), video, **capture)
+        frames = res["frames"]
+        cap = res["capture"]
+        stages = {}
+        for stage, key in (("render", "render_ms_per_frame"), ("capture_copy", "copy_ms_per_frame")):
+            if cap.get(key) is not None:
+                stages[stage] = {"total_ms": round(cap[key] * frames, 2), "calls": frames, "mean_ms": cap[key]}
+        timings = {"pipeline": "sim_render", "total_ms": res["wall_s"] * 1000, "stages": stages,
+                   "counts": {"frames": frames, "steps": res["steps"]}}
+        return frames, "frames", timings
+    return run
+
+
+RUNNERS = {
+    "object": _run_object,
+    "track": _run_track,
+    "track_bulk": _run_track_bulk,
+    "sim_network": _run_sim_network,
+    "sim_render": _run_sim_render,
+}
+
+
+def _skip_reason(case, model_kind):
+    if case["pipeline"] == "object" and case["config"]["render"] and not shutil.which("ffmpeg"):
+        return "ffmpeg not installed"
+    if case["pipeline"] == "sim_render":
+        try:
+            import panda3d  # noqa: F401
+        except ImportError:
+            return "panda3d not installed"
+    if model_kind == "real" and case["pipeline"] in ("object", "track", "track_bulk"):
+        try:
+            import ultralytics  # noqa: F401
+        except ImportError:
+            return "ultralytics not installed"
+    return None
+
+
+def run_case(case, input_path, out_dir, model_kind="standin", repeat=3):
+    """Run one case `repeat` times in this process and summarize the median run."""
+    threads = case["config"]["threads"]
+    cv2.setNumThreads(threads)
+    if model_kind == "real":
+        import torch  # type: ignore
+        torch.set_num_threads(threads)
+
+    run = RUNNERS[case["pipeline"]](case, input_path, out_dir, model_kind)
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        items, unit, timings = run()
+        runs.append((time.perf_counter() - t0, items, unit, timings))
+    walls = [r[0] for r in runs]
+    wall, items, unit, timings = sorted(runs, key=lambda r: r[0])[len(runs) // 2]
+    return {
+        "pipeline": case["pipeline"],
+        "data": case["data"],
+        "config": case["config"],
+        "unit": unit,
+        "items": items,
+        "wall_s": round(wall, 4),
+        "wall_s_all": [round(w, 4) for w in walls],
+        "wall_s_stdev": round(statistics.pstdev(walls), 4),
+        "throughput": round(items / wall, 2) if wall > 0 else None,  # items per second
+        "stages": {name: {"mean_ms": s["mean_ms"], "total_ms": s["total_ms"], "calls": s["calls"]}
+                   for name, s in timings["stages"].items()},
+        "counts": timings.get("counts", {}),
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+# =====================================================
+# Driver
+# =====================================================
+def _meta(model_kind):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "model": model_kind,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "ffmpeg": bool(shutil.which("ffmpeg")),
+    }
+
+
+def _spawn_case(case, input_path, workdir, model_kind, repeat):
+    out_dir = Path(workdir) / "out" / case["name"]
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True)
+    result_file = out_dir / "result.json"
+    threads = str(case["config"]["threads"])
+    # thread pools size themselves at import, so the limits go in before the child starts
+    env = {**os.environ, "OMP_NUM_THREADS": threads, "MKL_NUM_THREADS": threads,
+           "OPENBLAS_NUM_THREADS": threads, "PYTHONPATH": str(BACKEND_DIR)}
+    cmd = [sys.executable, str(Path(__file__).resolve()), "case", json.dumps(case), "--input", input_path or "",
+           "--out-dir", str(out_dir), "--model", model_kind, "--repeat", str(repeat), "--result", str(result_file)]
+    proc = subprocess.run(cmd, env=env, cwd=str(BACKEND_DIR), capture_output=True, text=True, timeout=CASE_TIMEOUT_S)
+    if proc.returncode != 0 or not result_file.exists():
+        tail = (proc.stderr or proc.stdout).strip().splitlines()[-5:]
+        return {"pipeline": case["pipeline"], "error": "\n".join(tail) or f"exit code {proc.returncode}"}
+    return json.loads(result_file.read_text())
+
+
+def run_suite(cases, workdir=DEFAULT_WORKDIR, model_kind="standin", repeat=3, log=print):
+    results = {"meta": _meta(model_kind), "cases": {}}
+    for case in cases:
+        reason = _skip_reason(case, model_kind)
+        if reason:
+            log(f"  {case['name']:<28} skipped: {reason}")
+            results["cases"][case["name"]] = {"pipeline": case["pipeline"], "skipped": reason}
+            continue
+        input_path = prepare_inputs(case, workdir)
+        res = _spawn_case(case, input_path, workdir, model_kind, repeat)
+        results["cases"][case["name"]] = res
+        if "error" in res:
+            log(f"  {case['name']:<28} FAILED: {res['error']}")
+        else:
+            log(f"  {case['name']:<28} {res['throughput']:>10} {res['unit']}/s  "
+                f"{res['wall_s']:>8.3f} s  {res['peak_rss_mb']:>7} MB")
+    return results
+
+
+def _pct(cur, base):
+    return (cur / base - 1.0) if base else None
+
+
+def compare(current, baseline, fps_tolerance=FPS_TOLERANCE, rss_tolerance=RSS_TOLERANCE):
+    """Per-case throughput/RSS change against a baseline. Returns (rows, regressions)."""
+    rows, regressions = [], []
+    for name, cur in current["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if not base or "throughput" not in cur or "throughput" not in base:
+            rows.append({"case": name, "status": "no baseline" if not base else "not comparable"})
+            continue
+        d_tp = _pct(cur["throughput"], base["throughput"])
+        d_rss = _pct(cur["peak_rss_mb"], base["peak_rss_mb"])
+        # stages that got slower, worst first, to point at where the time went
+        slower = []
+        for stage, s in cur["stages"].items():
+            b = base["stages"].get(stage)
+            if b and b.get("mean_ms") and s.get("mean_ms") is not None:
+                change = _pct(s["mean_ms"], b["mean_ms"])
+                if change is not None and change > fps_tolerance and s["total_ms"] - b["total_ms"] > STAGE_NOISE_MS:
+                    slower.append((stage, round(change * 100, 1)))
+        slower.sort(key=lambda x: -x[1])
+        status = "ok"
+        if d_tp is not None and d_tp < -fps_tolerance:
+            status = "REGRESSION"
+        if d_rss is not None and d_rss > rss_tolerance:
+            status = "REGRESSION"
+        row = {"case": name, "status": status, "throughput": cur["throughput"], "baseline": base["throughput"],
+               "throughput_change_pct": round(d_tp * 100, 1) if d_tp is not None else None,
+               "peak_rss_mb": cur["peak_rss_mb"], "baseline_rss_mb": base["peak_rss_mb"],
+               "rss_change_pct": round(d_rss * 100, 1) if d_rss is not None else None,
+               "slower_stages": dict(slower[:3])}
+        rows.append(row)
+        if status == "REGRESSION":
+            regressions.append(row)
+    return rows, regressions
+
+
+def _print_comparison(rows, current, baseline):
+    for key in ("cpu_count", "model", "platform"):
+        if current["meta"].get(key) != baseline.get("meta", {}).get(key):
+            print(f"note: baseline {key} differs ({baseline.get('meta', {}).get(key)!r} vs "
+                  f"{current['meta'].get(key)!r}); numbers may not be comparable")
+    print(f"{'case':<28} {'throughput':>11} {'baseline':>10} {'change':>8} {'rss MB':>8} {'change':>8}  status")
+    for r in rows:
+        if "throughput" not in r:
+            print(f"{r['case']:<28} {'':>11} {'':>10} {'':>8} {'':>8} {'':>8}  {r['status']}")
+            continue
+        extra = f"  slower: {r['slower_stages']}" if r["slower_stages"] else ""
+        print(f"{r['case']:<28} {r['throughput']:>11} {r['baseline']:>10} {r['throughput_change_pct']:>7}% "
+              f"{r['peak_rss_mb']:>8} {r['rss_change_pct']:>7}%  {r['status']}{extra}")
+
+
+def _load_baseline(ap, path):
+    path = Path(path)
+    if not path.exists():
+        ap.error(f"no baseline at {path}; record one on this machine first with "
+                 f"'python benchmark.py run --suite quick --save-baseline {path}'")
+    return json.loads(path.read_text())
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the inference and simulation pipelines.")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="run a suite and save the results")
+    run_p.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    run_p.add_argument("--cases", help="comma-separated case names (from any suite)")
+    run_p.add_argument("--model", choices=("standin", "real"), default="standin")
+    run_p.add_argument("--repeat", type=int, default=3, help="runs per case; the median is reported")
+    run_p.add_argument("--workdir", default=str(DEFAULT_WORKDIR), help="synthetic inputs and outputs")
+    run_p.add_argument("--out", default="benchmark_results.json")
+    run_p.add_argument("--baseline", nargs="?", const=str(DEFAULT_BASELINE),
+                       help="compare against this results file (default: DEFAULT_BASELINE); exit 1 on regression")
+    run_p.add_argument("--save-baseline", nargs="?", const=str(DEFAULT_BASELINE),
+                       help="also write the results to this baseline file (default: DEFAULT_BASELINE)")
+    run_p.add_argument("--tolerance", type=float, default=FPS_TOLERANCE, help="allowed relative throughput drop")
+    run_p.add_argument("--rss-tolerance", type=float, default=RSS_TOLERANCE, help="allowed relative RSS growth")
+
+    cmp_p = sub.add_parser("compare", help="compare two results files")
+    cmp_p.add_argument("current")
+    cmp_p.add_argument("baseline", nargs="?", default=str(DEFAULT_BASELINE))
+    cmp_p.add_argument("--tolerance", type=float, default=FPS_TOLERANCE)
+    cmp_p.add_argument("--rss-tolerance", type=float, default=RSS_TOLERANCE)
+
+    case_p = sub.add_parser("case", help=argparse.SUPPRESS)  # one case, inside its own process
+    case_p.add_argument("case")
+    case_p.add_argument("--input", default="")
+    case_p.add_argument("--out-dir", required=True)
+    case_p.add_argument("--model", default="standin")
+    case_p.add_argument("--repeat", type=int, default=3)
+    case_p.add_argument("--result", required=True)
+
+    args = ap.parse_args(argv)
+
+    if args.command == "case":
+        res = run_case(json.loads(args.case), args.input or None, args.out_dir, args.model, args.repeat)
+        Path(args.result).write_text(json.dumps(res, indent=2))
+        return 0
+
+    if args.command == "compare":
+        baseline = _load_baseline(ap, args.baseline)
+        current = json.loads(Path(args.current).read_text())
+        rows, regressions = compare(current, baseline, args.tolerance, args.rss_tolerance)
+        _print_comparison(rows, current, baseline)
+        return 1 if regressions else 0
+
+    if args.baseline:
+        _load_baseline(ap, args.baseline)  # fail before spending minutes on the suite
+    if args.cases:
+        by_name = {c["name"]: c for suite in SUITES.values() for c in suite}
+        unknown = [n for n in args.cases.split(",") if n not in by_name]
+        if unknown:
+            ap.error(f"unknown cases: {', '.join(unknown)}")
+        cases = [by_name[n] for n in args.cases.split(",")]
+    else:
+        cases = SUITES[args.suite]
+
+    print(f"Running {len(cases)} cases (model={args.model}, repeat={args.repeat})")
+    results = run_suite(cases, args.workdir, args.model, args.repeat)
+    Path(args.out).write_text(json.dumps(results, indent=2))
+    print(f"Results written to {args.out}")
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2))
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        baseline = _load_baseline(ap, args.baseline)
+        rows, regressions = compare(results, baseline, args.tolerance, args.rss_tolerance)
+        _print_comparison(rows, results, baseline)
+        return 1 if regressions else 0
+    failed = [n for n, r in results["cases"].items() if "error" in r]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""
+Render-free Monte Carlo sweeps of the braking logic.
+
+Every scenario is a train approaching a static hazard at constant speed. The
+hazard becomes visible inside `detection_range`; the distance the train
+*believes* it has is the true distance scaled by a calibration error (the
+K_CALIB bbox-height estimate in inference_object). Once the braking rule fires,
+the train keeps its speed for `reaction_time` and then decelerates at `decel`.
+The rule's thresholds and defaults are imported from inference_object, so the
+sweep always tests the ones the detector uses.
+All scenarios are evaluated at once with NumPy in closed form, so tens of
+thousands of scenarios take milliseconds.
+
+CLI:  python braking_sweep.py --n 20000 --speed 40 160 --decel 0.8 1.4 --policy ai
+"""
+import json
+import argparse
+from typing import Optional, Union
+
+import numpy as np  # type: ignore
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError, confloat, conlist
+
+from inference_object import REACTION_TIME, DECEL, WARNING_DIST, stopping_distance, emergency_distance
+from profiling import new_profile, run_profiled
+
+# ---------------- CONFIG ----------------
+MIN_GAP = 60.0  # the demos' safety gap
+DETECTION_RANGE = 300.0
+POLICIES = ("gap", "ai")
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+SPEED_BANDS = 8
+
+router = APIRouter()
+
+
+def range_param(**bounds):
+    """A fixed value, or [low, high] sampled uniformly; both ends obey `bounds`."""
+    value = confloat(**bounds)
+    return Union[value, conlist(value, min_length=2, max_length=2)]
+
+
+def check_ranges(params, fields):
+    """ValueError for the first [low, high] range in `params` with low > high."""
+    for name in fields:
+        spec = params.get(name)
+        if isinstance(spec, (list, tuple)) and spec[0] > spec[1]:
+            raise ValueError(f"{name} range must be [low, high] with low <= high")
+
+
+def range_arg(values):
+    """CLI nargs="+" values as a range_param value; more than two are left for validation to reject."""
+    return values[0] if len(values) == 1 else list(values)
+
+
+Param = range_param(ge=0)
+PositiveParam = range_param(gt=0)
+RANGE_FIELDS = ("speed_kmph", "decel", "reaction_time", "detection_range", "min_gap")
+
+
+def _sample(rng, spec, n):
+    if isinstance(spec, (list, tuple)):
+        lo, hi = spec
+        return rng.uniform(lo, hi, n)
+    return np.full(n, float(spec))
+
+
+def sample_scenarios(n=10000, seed=0, speed_kmph=(40.0, 120.0), decel=(0.8, 1.4), reaction_time=(0.5, 2.0),
+                     detection_range=DETECTION_RANGE, min_gap=MIN_GAP, calib_error=0.15):
+    """Draw n scenarios; calib_error is the std-dev of the relative distance-estimate error."""
+    rng = np.random.default_rng(seed)
+    return {
+        "speed_kmph": _sample(rng, speed_kmph, n),
+        "decel": _sample(rng, decel, n),
+        "reaction_time": _sample(rng, reaction_time, n),
+        "detection_range": _sample(rng, detection_range, n),
+        "min_gap": _sample(rng, min_gap, n),
+        # estimated = true * calib; clipped so a wildly wrong estimate stays positive
+        "calib": np.clip(1.0 + rng.normal(0.0, calib_error, n), 0.2, None),
+    }
+
+
+def simulate(sc, policy="gap", plan_decel=DECEL, plan_reaction=REACTION_TIME, warning_dist=WARNING_DIST):
+    """
+    Evaluate all scenarios at once. Returns per-scenario arrays.
+
+    policy "gap": brake when the estimated distance drops below the planned
+                  stopping distance + min_gap (the rule of the Panda3D demos).
+    policy "ai":  brake on BRAKE_EMERGENCY from inference_object.ai_decision.
+    """
+    v = sc["speed_kmph"] / 3.6
+    a = sc["decel"]
+    t_r = sc["reaction_time"]
+    calib = sc["calib"]
+
+    if policy == "gap":
+        threshold = stopping_distance(sc["speed_kmph"], plan_reaction, plan_decel) + sc["min_gap"]
+    elif policy == "ai":
+        threshold = emergency_distance(sc["speed_kmph"], plan_reaction, plan_decel)
+    else:
+        raise ValueError(f"Unknown policy {policy!r}, expected one of {POLICIES}")
+
+    # true distance at which the rule fires: hazard visible and estimate below threshold
+    decision_dist = np.minimum(sc["detection_range"], threshold / calib)
+    onset_dist = decision_dist - v * t_r
+    braking_dist = v ** 2 / (2.0 * a)
+    margin = onset_dist - braking_dist
+    collision = margin < 0.0
+
+    # speed at the hazard for collisions (full speed if braking never started before it)
+    v_left_sq = v ** 2 - 2.0 * a * np.maximum(onset_dist, 0.0)
+    impact_kmph = np.where(collision, np.sqrt(np.clip(v_left_sq, 0.0, None)) * 3.6, 0.0)
+
+    time_to_stop = t_r + v / a
+    warn_dist = np.minimum(sc["detection_range"], warning_dist / calib)
+    warning_lead = np.clip(warn_dist - decision_dist, 0.0, None) / np.maximum(v, 1e-6)
+
+    return {
+        "decision_dist_m": decision_dist,
+        "stopping_margin_m": margin,
+        "collision": collision,
+        "impact_kmph": impact_kmph,
+        "time_to_stop_s": time_to_stop,
+        "warning_lead_s": warning_lead,
+    }
+
+
+def _percentiles(x):
+    if x.size == 0:
+        return None
+    return {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(x, PERCENTILES))}
+
+
+def summarize(sc, res, bins=20):
+    margin = res["stopping_margin_m"]
+    counts, edges = np.histogram(margin, bins=bins)
+
+    # collision rate per speed band, to see where a threshold stops being enough
+    speed = sc["speed_kmph"]
+    band_edges = np.linspace(speed.min(), speed.max() + 1e-9, SPEED_BANDS + 1)
+    band = np.clip(np.digitize(speed, band_edges) - 1, 0, SPEED_BANDS - 1)
+    hits = np.bincount(band, weights=res["collision"], minlength=SPEED_BANDS)
+    totals = np.bincount(band, minlength=SPEED_BANDS)
+    by_speed = [
+        {"speed_kmph": [round(float(band_edges[i]), 1), round(float(band_edges[i + 1]), 1)],
+         "scenarios": int(totals[i]),
+         "collision_rate": round(float(hits[i] / totals[i]), 4) if totals[i] else None}
+        for i in range(SPEED_BANDS)
+    ]
+
+    collided = res["collision"]
+    return {
+        "scenarios": int(margin.size),
+        "collision_rate": round(float(collided.mean()), 4),
+        "stopping_margin_m": _percentiles(margin),
+        "time_to_stop_s": _percentiles(res["time_to_stop_s"]),
+        "impact_kmph": _percentiles(res["impact_kmph"][collided]),
+        "warning_lead_s": _percentiles(res["warning_lead_s"]),
+        "margin_histogram": {"edges": [round(float(e), 2) for e in edges], "counts": counts.tolist()},
+        "by_speed": by_speed,
+    }
+
+
+def run_sweep(n=10000, seed=0, policy="gap", plan_decel=DECEL, plan_reaction=REACTION_TIME,
+              warning_dist=WARNING_DIST, **ranges):
+    sc = sample_scenarios(n=n, seed=seed, **ranges)
+    res = simulate(sc, policy=policy, plan_decel=plan_decel, plan_reaction=plan_reaction, warning_dist=warning_dist)
+    return summarize(sc, res)
+
+
+# =====================================================
+# API
+# =====================================================
+class SweepRequest(BaseModel):
+    n: int = 10000
+    seed: int = 0
+    policy: str = "gap"
+    speed_kmph: PositiveParam = [40.0, 120.0]
+    decel: PositiveParam = [0.8, 1.4]
+    reaction_time: PositiveParam = [0.5, 2.0]
+    detection_range: PositiveParam = DETECTION_RANGE
+    min_gap: Param = MIN_GAP
+    calib_error: float = Field(0.15, ge=0)
+    plan_decel: float = Field(DECEL, gt=0)
+    plan_reaction: float = Field(REACTION_TIME, gt=0)
+    warning_dist: float = Field(WARNING_DIST, ge=0)
+
+
+MAX_SCENARIOS = 1_000_000
+
+
+@router.post("/sweep")
+async def braking_sweep(req: Optional[SweepRequest] = None, profile: bool = False, profile_mode: str = "sample"):
+    """Monte Carlo braking sweep; a fixed value or a [low, high] range for each parameter."""
+    req = req or SweepRequest()
+    if not 1 <= req.n <= MAX_SCENARIOS:
+        raise HTTPException(status_code=422, detail=f"n must be between 1 and {MAX_SCENARIOS}")
+    if req.policy not in POLICIES:
+        raise HTTPException(status_code=422, detail=f"policy must be one of {POLICIES}")
+    params = req.model_dump() if hasattr(req, "model_dump") else req.dict()
+    try:
+        check_ranges(params, RANGE_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    prof = new_profile("sweep", profile_mode) if profile else None
+    summary = await run_in_threadpool(run_profiled, prof, run_sweep, **params)
+    if prof:
+        return {"params": params, "summary": summary, "profile": prof.info()}
+    return {"params": params, "summary": summary}
+
+
+# =====================================================
+# CLI
+# =====================================================
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Vectorized Monte Carlo braking sweep (no rendering).")
+    ap.add_argument("--n", type=int, default=10000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--policy", choices=POLICIES, default="gap")
+    ap.add_argument("--speed", type=float, nargs="+", default=[40.0, 120.0], help="km/h, value or LOW HIGH")
+    ap.add_argument("--decel", type=float, nargs="+", default=[0.8, 1.4], help="m/s^2, value or LOW HIGH")
+    ap.add_argument("--reaction", type=float, nargs="+", default=[0.5, 2.0], help="s, value or LOW HIGH")
+    ap.add_argument("--detection-range", type=float, nargs="+", default=[DETECTION_RANGE], help="m")
+    ap.add_argument("--min-gap", type=float, nargs="+", default=[MIN_GAP], help="m")
+    ap.add_argument("--calib-error", type=float, default=0.15, help="relative std-dev of distance estimates")
+    ap.add_argument("--plan-decel", type=float, default=DECEL)
+    ap.add_argument("--plan-reaction", type=float, default=REACTION_TIME)
+    ap.add_argument("--warning-dist", type=float, default=WARNING_DIST)
+    args = ap.parse_args(argv)
+
+    # same checks as the endpoint
+    try:
+        req = SweepRequest(
+            n=args.n, seed=args.seed, policy=args.policy,
+            plan_decel=args.plan_decel, plan_reaction=args.plan_reaction, warning_dist=args.warning_dist,
+            speed_kmph=range_arg(args.speed), decel=range_arg(args.decel), reaction_time=range_arg(args.reaction),
+            detection_range=range_arg(args.detection_range), min_gap=range_arg(args.min_gap),
+            calib_error=args.calib_error,
+        )
+        params = req.model_dump()
+        check_ranges(params, RANGE_FIELDS)
+    except (ValidationError, ValueError) as e:
+        ap.error(str(e))
+    if not 1 <= args.n <= MAX_SCENARIOS:
+        ap.error(f"--n must be between 1 and {MAX_SCENARIOS}")
+
+    summary = run_sweep(**params)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
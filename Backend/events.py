@@ -0,0 +1,135 @@
+import os
+import math
+
+import cv2  # type: ignore
+
+# ---------------- CONFIG ----------------
+# a hazard that disappears for more than MAX_GAP_FRAMES source frames closes its event
+MAX_GAP_FRAMES = 12
+# a detection continues an open event when it overlaps the last box of that event,
+# or when its centre moved less than MATCH_CENTER_RATIO x the last box diagonal
+MATCH_IOU = 0.1
+MATCH_CENTER_RATIO = 1.0
+
+
+def bbox_iou(a, b):
+    ax1, ay1, ax2, ay2 = a
+    bx1, by1, bx2, by2 = b
+    iw = max(0.0, min(ax2, bx2) - max(ax1, bx1))
+    ih = max(0.0, min(ay2, by2) - max(ay1, by1))
+    inter = iw * ih
+    union = max(0.0, ax2 - ax1) * max(0.0, ay2 - ay1) + max(0.0, bx2 - bx1) * max(0.0, by2 - by1) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _center_shift_ratio(a, b):
+    acx, acy = (a[0] + a[2]) / 2.0, (a[1] + a[3]) / 2.0
+    bcx, bcy = (b[0] + b[2]) / 2.0, (b[1] + b[3]) / 2.0
+    diag = max(1.0, math.hypot(a[2] - a[0], a[3] - a[1]))
+    return math.hypot(acx - bcx, acy - bcy) / diag
+
+
+class EventAggregator:
+    """
+    Groups consecutive detections of the same hazard into a single event.
+
+    Every detection is fed through `add()`; detections of the same label whose box
+    overlaps (or sits next to) the last box of an open event extend that event,
+    everything else opens a new one. An event closes once its hazard has not been
+    seen for `max_gap` frames. Each event keeps the row of its highest-risk
+    detection, the worst decision, the minimum distance and one snapshot crop.
+    `on_new(row)` is called with the first row of every new event, as it opens.
+    """
+
+    def __init__(self, severity, fps=None, snaps_dir=None, max_gap=MAX_GAP_FRAMES, on_new=None):
+        self.severity = severity          # decision -> rank, higher is worse
+        self.fps = fps
+        self.snaps_dir = snaps_dir
+        self.max_gap = max_gap
+        self.on_new = on_new
+        self.open = []
+        self.closed = []
+        self._next_id = 1
+
+    def add(self, frame, label, bbox, row, risk, distance, decision, crop=None):
+        """Record one detection. Returns (event, is_new)."""
+        self._expire(frame)
+        ev = self._match(frame, label, bbox)
+        is_new = ev is None
+        if is_new:
+            ev = {
+                "event_id": self._next_id, "label": label,
+                "start_frame": frame, "end_frame": frame, "frames": 0,
+                "bbox": bbox, "row": row, "risk": risk, "decision": decision,
+                "min_distance": distance, "crop": None,
+            }
+            self._next_id += 1
+            self.open.append(ev)
+
+        ev["end_frame"] = frame
+        ev["frames"] += 1
+        ev["bbox"] = bbox
+        ev["min_distance"] = min(ev["min_distance"], distance)
+        if self.severity.get(decision, 0) > self.severity.get(ev["decision"], 0):
+            ev["decision"] = decision
+        if is_new or risk > ev["risk"]:
+            ev["risk"] = risk
+            ev["row"] = row
+            if crop is not None and crop.size > 0:
+                ev["crop"] = crop.copy()
+        if is_new and self.on_new is not None:
+            self.on_new({"event_id": ev["event_id"], "label": label, **row, "decision": decision,
+                         "distance_m": round(distance, 1)})
+        return ev, is_new
+
+    def finish(self):
+        """Close all open events and return one row per event, ordered by start frame."""
+        for ev in self.open:
+            self._close(ev)
+        self.open = []
+        return sorted(self.closed, key=lambda r: r["event_id"])
+
+    def _match(self, frame, label, bbox):
+        best, best_iou = None, -1.0
+        for ev in self.open:
+            # one hazard yields at most one detection per frame
+            if ev["label"] != label or ev["end_frame"] == frame:
+                continue
+            iou = bbox_iou(ev["bbox"], bbox)
+            if iou < MATCH_IOU and _center_shift_ratio(ev["bbox"], bbox) > MATCH_CENTER_RATIO:
+                continue
+            if iou > best_iou:
+                best, best_iou = ev, iou
+        return best
+
+    def _expire(self, frame):
+        still_open = []
+        for ev in self.open:
+            if frame - ev["end_frame"] > self.max_gap:
+                self._close(ev)
+            else:
+                still_open.append(ev)
+        self.open = still_open
+
+    def _close(self, ev):
+        snapshot = None
+        if self.snaps_dir and ev["crop"] is not None:
+            os.makedirs(self.snaps_dir, exist_ok=True)
+            snapshot = f"{self.snaps_dir}/event_{ev['event_id']}_{ev['label']}.jpg"
+            cv2.imwrite(snapshot, ev["crop"])
+
+        out = {
+            "event_id": ev["event_id"],
+            "label": ev["label"],
+            "start_frame": ev["start_frame"],
+            "end_frame": ev["end_frame"],
+            "frames": ev["frames"],
+        }
+        if self.fps:
+            out["start_s"] = round(ev["start_frame"] / self.fps, 2)
+            out["end_s"] = round(ev["end_frame"] / self.fps, 2)
+        out.update(ev["row"])
+        out["decision"] = ev["decision"]
+        out["min_distance_m"] = round(ev["min_distance"], 1)
+        out["snapshot"] = snapshot
+        self.closed.append(out)
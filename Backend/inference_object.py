@@ -1,15 +1,16 @@
 import os
+import json
 import time
-import uuid
 import math
+import threading
 from pathlib import Path
 import subprocess
 
 import cv2  # type: ignore
 import numpy as np  # type: ignore
-import pandas as pd  # type: ignore
-import folium  # type: ignore
-from ultralytics import YOLO  # type: ignore
+
+from events import EventAggregator
+from metrics import StageTimer, model_call
 
 # ---------------- CONFIG ----------------
 # Change the MODEL_PATH to your local yolov8 weights path
@@ -27,7 +28,11 @@ K_CALIB = 4200.0
 REACTION_TIME = 1.0
 DECEL = 1.2
 WARNING_DIST = 150.0
+EMERGENCY_STOP_RATIO = 0.8   # BRAKE_EMERGENCY inside this fraction of the stopping distance...
+EMERGENCY_TTC_S = 5.0        # ...or at this time to collision
+SLOW_DOWN_STOP_RATIO = 1.5
 PERSISTENCE_FRAMES = 3
+DECISION_SEVERITY = {"CLEAR": 0, "CAUTION": 1, "SLOW_DOWN": 2, "BRAKE_EMERGENCY": 3}
 
 CLASS_WEIGHT = {
     "person": 1.0, "car": 0.9, "truck": 1.1, "motorcycle": 0.95, "bicycle": 0.95,
@@ -54,8 +59,39 @@ def get_gps_from_route(frame_count):
     return TRAIN_ROUTE[frame_count % len(TRAIN_ROUTE)]
 
 
-# load model once
-model = YOLO(MODEL_PATH)
+DETECTIONS_OUT = "detections.json"
+FINAL_VIDEO_OUT = "output_avc1.mp4"
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """The detection model, loaded once on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from ultralytics import YOLO  # type: ignore
+                _model = YOLO(MODEL_PATH)
+    return _model
+
+
+def set_model(m):
+    """Use another model object with the same predict() API (benchmarks, preloaded weights)."""
+    global _model
+    _model = m
+
+
+def model_loaded():
+    return _model is not None
+
+
+def warmup(device="cpu"):
+    """Load the model and run one dummy batch, so the first real request skips the setup cost."""
+    import pandas, folium  # noqa: F401  # the CSV/map writers' imports
+    get_model().predict([np.zeros((IMG_SIZE, IMG_SIZE, 3), dtype=np.uint8)], imgsz=IMG_SIZE, verbose=False,
+                        device=device)
 
 
 def convert_to_avc1(input_path: str, output_path: str):
@@ -76,9 +112,15 @@ def estimate_distance_from_bbox(bbox, k_calib=K_CALIB, min_cap=2.0, max_cap=300.
     return float(np.clip(d, min_cap, max_cap))
 
 
-def stopping_distance(speed_kmph):
+def stopping_distance(speed_kmph, reaction_time=REACTION_TIME, decel=DECEL):
     v = speed_kmph / 3.6
-    return v * REACTION_TIME + (v ** 2) / (2 * DECEL)
+    return v * reaction_time + (v ** 2) / (2 * decel)
+
+
+def emergency_distance(speed_kmph, reaction_time=REACTION_TIME, decel=DECEL):
+    """Distance at which ai_decision turns BRAKE_EMERGENCY for an object approached at speed_kmph (arrays work too)."""
+    ttc_dist = EMERGENCY_TTC_S * np.maximum(0.1, speed_kmph / 3.6)
+    return np.maximum(EMERGENCY_STOP_RATIO * stopping_distance(speed_kmph, reaction_time, decel), ttc_dist)
 
 
 def risk_score(distance, conf, cls, speed_kmph):
@@ -92,9 +134,9 @@ def risk_score(distance, conf, cls, speed_kmph):
 
 def ai_decision(distance, ttc, speed_kmph, cls=None):
     safe_stop = stopping_distance(speed_kmph)
-    if distance <= safe_stop * 0.8 or ttc <= 5:
+    if distance <= safe_stop * EMERGENCY_STOP_RATIO or ttc <= EMERGENCY_TTC_S:
         return "BRAKE_EMERGENCY"
-    elif distance <= safe_stop * 1.5:
+    elif distance <= safe_stop * SLOW_DOWN_STOP_RATIO:
         return "SLOW_DOWN"
     elif distance <= WARNING_DIST:
         return "CAUTION"
@@ -176,16 +218,197 @@ def draw_hud(frame, speed_kmph, overall_decision, overall_risk, thumbnails):
     return frame
 
 
-def run_inference(input_path: str, sim_speed: float = 80.0, device: str = "cpu", out_dir: str = "outputs") -> dict:
+def annotate_frame(frame, record, speed_kmph, thumbnails):
+    """Draw the boxes and HUD of one stored detection record onto frame (in place)."""
+    for d in record["dets"]:
+        x1, y1, x2, y2 = d["bbox"]
+        decision = d["decision"]
+        color = (0, 255, 0) if decision == "CLEAR" else (0, 165, 255) if decision in ["SLOW_DOWN", "CAUTION"] else (0, 0, 255)
+        if d.get("thumb"):
+            crop = frame[max(0, y1):min(frame.shape[0], y2), max(0, x1):min(frame.shape[1], x2)]
+            if crop.size > 0:
+                thumbnails.append(cv2.resize(crop, (140, 80)))
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f"{d['cls']} {d['conf']:.2f} {decision}", (x1, max(20, y1 - 5)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    return draw_hud(frame, speed_kmph, record["decision"], record["risk"], thumbnails)
+
+
+_render_lock = threading.Lock()
+
+
+def render_video(out_dir: str = "outputs") -> str:
+    """
+    Build the annotated AVC1 video of the last run in out_dir from its stored
+    detections and the source video. The result is cached until the next run.
+    """
+    detections_path = f"{out_dir}/{DETECTIONS_OUT}"
+    final_video = f"{out_dir}/{FINAL_VIDEO_OUT}"
+    with _render_lock:
+        if os.path.exists(final_video) and os.path.getmtime(final_video) >= os.path.getmtime(detections_path):
+            return final_video
+
+        timer = StageTimer("object_render")
+        try:
+            with open(detections_path) as f:
+                stored = json.load(f)
+            by_frame = {r["frame"]: r for r in stored["frames"]}
+
+            cap = cv2.VideoCapture(stored["source"])
+            if not cap.isOpened():
+                raise RuntimeError(f"Cannot open source video {stored['source']}")
+            out_video = f"{out_dir}/output.mp4"
+            writer = cv2.VideoWriter(out_video, cv2.VideoWriter_fourcc(*"mp4v"), stored["fps"], tuple(stored["size"]))
+            thumbnails = []
+            frame_count = 0
+            try:
+                while True:
+                    with timer.stage("decode"):
+                        ok, frame = cap.read()
+                    if not ok:
+                        break
+                    frame_count += 1
+                    record = by_frame.get(frame_count)
+                    if record is not None:
+                        with timer.stage("hud"):
+                            annotated = annotate_frame(frame, record, stored["speed"], thumbnails)
+                        with timer.stage("encode"):
+                            writer.write(annotated)
+                        timer.count("frames")
+            finally:
+                cap.release()
+                writer.release()
+
+            with timer.stage("ffmpeg"):
+                convert_to_avc1(out_video, final_video)
+        except BaseException:
+            timer.finish("error")
+            raise
+        timer.finish()
+        return final_video
+
+
+def _filter_detections(r, frame_orig, frame_id, persistence):
+    """Boxes of one result that are whitelisted, confident, big enough, inside the rail ROI and persistent."""
+    filtered_dets = []
+    if getattr(r, "boxes", None) is None or len(r.boxes) == 0:
+        return filtered_dets
+
+    scale_x = frame_orig.shape[1] / IMG_SIZE
+    scale_y = frame_orig.shape[0] / IMG_SIZE
+    xyxy = r.boxes.xyxy.cpu().numpy()
+    cls_ids = r.boxes.cls.cpu().numpy().astype(int)
+    confs = r.boxes.conf.cpu().numpy()
+    names = r.names
+
+    for box, cid, conf in zip(xyxy, cls_ids, confs):
+        cls_name = names.get(int(cid), str(cid)).lower()
+        if cls_name in IGNORED_CLASSES: continue
+        if cls_name not in WHITELIST_CLASSES: continue
+        if conf < MIN_CONF_DEFAULT: continue
+
+        x1, y1, x2, y2 = box
+        x1 *= scale_x; x2 *= scale_x; y1 *= scale_y; y2 *= scale_y
+        bbox = [x1, y1, x2, y2]
+
+        if (y2 - y1) < MIN_BBOX_HEIGHT_PX or bbox_area(bbox) < MIN_BBOX_AREA_PX: continue
+        if not is_in_rail_roi(bbox, frame_orig.shape): continue
+
+        gx = int(center_of_bbox(bbox)[0] // 20)
+        gy = int(center_of_bbox(bbox)[1] // 20)
+        key = (cls_name, gx, gy)
+        st = persistence.get(key, {"count": 0, "last": 0})
+        if frame_id - st["last"] > FORGET_FRAMES:
+            st = {"count": 0, "last": 0}
+
+        st["count"] += 1
+        st["last"] = frame_id
+        persistence[key] = st
+
+        if st["count"] >= PERSISTENCE_FRAMES:
+            filtered_dets.append({"bbox": bbox, "cls": cls_name, "conf": float(conf)})
+    return filtered_dets
+
+
+def _score_frame(filtered_dets, frame_orig, frame_id, sim_speed, events, start_t):
+    """Distance, risk and decision for every kept box; hazards go to events. Returns the frame record."""
+    record_dets = []
+    per_frame_risks = []
+    per_frame_decisions = []
+    for d in filtered_dets:
+        dist = estimate_distance_from_bbox(d["bbox"])
+        ttc = dist / max(0.1, sim_speed / 3.6)
+        score = risk_score(dist, d["conf"], d["cls"], sim_speed)
+        decision = ai_decision(dist, ttc, sim_speed, d["cls"])
+        det = {"bbox": [int(v) for v in d["bbox"]], "cls": d["cls"], "conf": round(d["conf"], 4),
+               "decision": decision}
+
+        if decision != "CLEAR":
+            x1, y1, x2, y2 = det["bbox"]
+            crop = frame_orig[max(0, y1):min(frame_orig.shape[0], y2), max(0, x1):min(frame_orig.shape[1], x2)]
+            lat, lon = get_gps_from_route(frame_id)
+            _, is_new = events.add(frame_id, d["cls"], d["bbox"], {
+                "time_s": round(time.time() - start_t, 2),
+                "frame": frame_id,
+                "label": d["cls"],
+                "conf": round(d["conf"], 2),
+                "distance_m": round(dist, 1),
+                "ttc_s": round(ttc, 1),
+                "risk_score": round(score, 1),
+                "lat": lat,
+                "lon": lon,
+            }, risk=score, distance=dist, decision=decision, crop=crop)
+            # one HUD thumbnail per hazard, not per frame
+            det["thumb"] = is_new
+
+        record_dets.append(det)
+        per_frame_risks.append(score)
+        per_frame_decisions.append(decision)
+
+    if not per_frame_risks:
+        overall_risk = 0.0
+        overall_decision = "CLEAR"
+    else:
+        overall_risk = float(np.clip(max(per_frame_risks), 0, 100))
+        if any(d == "BRAKE_EMERGENCY" for d in per_frame_decisions):
+            overall_decision = "BRAKE_EMERGENCY"
+        elif any(d == "SLOW_DOWN" for d in per_frame_decisions):
+            overall_decision = "SLOW_DOWN"
+        elif any(d == "CAUTION" for d in per_frame_decisions):
+            overall_decision = "CAUTION"
+        else:
+            overall_decision = "CLEAR"
+
+    return {"frame": frame_id, "decision": overall_decision, "risk": round(overall_risk, 2), "dets": record_dets}
+
+
+def run_inference(input_path: str, sim_speed: float = 80.0, device: str = "cpu", out_dir: str = "outputs",
+                  render: bool = True, timer: StageTimer = None, progress=None) -> dict:
     """
     Run the full Suraksha Rail pipeline on a video file.
     Writes artifacts into the provided out_dir (session folder).
+    With render=False only detections, CSV and map are produced (alerts-only mode);
+    the annotated video is then built on demand by render_video().
+    Stage timings go to `timer` (a new "object" StageTimer if not given) and are
+    returned under "timings". `progress` (a progress.JobProgress) receives frame
+    counts and new alerts while the video is processed.
     Returns a dict with absolute paths for debugging (optional).
     """
+    timer = timer or StageTimer("object")
+    try:
+        results = _run_inference(input_path, sim_speed, device, out_dir, render, timer, progress)
+    except BaseException:
+        timer.finish("error")
+        raise
+    results["timings"] = timer.finish()
+    return results
+
+
+def _run_inference(input_path, sim_speed, device, out_dir, render, timer, progress=None):
     os.makedirs(out_dir, exist_ok=True)
     out_video = f"{out_dir}/output.mp4"             # intermediate writer
     out_csv = f"{out_dir}/alerts.csv"
     out_map = f"{out_dir}/map.html"
+    out_detections = f"{out_dir}/{DETECTIONS_OUT}"
     snaps_dir = f"{out_dir}/snaps"
     os.makedirs(snaps_dir, exist_ok=True)
 
@@ -196,160 +419,118 @@ def run_inference(input_path: str, sim_speed: float = 80.0, device: str = "cpu",
     out_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     out_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     out_fps = max(10, int(cap.get(cv2.CAP_PROP_FPS) or 20))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
 
     # Use avc1 as intermediate codec where possible; ffmpeg will re-encode final file.
-    writer = cv2.VideoWriter(out_video, cv2.VideoWriter_fourcc(*"mp4v"), out_fps, (out_w, out_h))
+    # In alerts-only mode nothing is drawn or encoded; render_video() does it on demand.
+    writer = None
+    if render:
+        writer = cv2.VideoWriter(out_video, cv2.VideoWriter_fourcc(*"mp4v"), out_fps, (out_w, out_h))
 
-    alerts = []
+    events = EventAggregator(DECISION_SEVERITY, fps=cap.get(cv2.CAP_PROP_FPS) or None, snaps_dir=snaps_dir,
+                             on_new=progress.alert if progress is not None else None)
     persistence = {}
     RECENT_THUMBNAILS = []
+    records = []
 
     batch_frames = []
     batch_orig = []
+    batch_ids = []
     frame_count = 0
     start_t = time.time()
 
     try:
         while True:
-            ok, frame = cap.read()
+            with timer.stage("decode"):
+                ok, frame = cap.read()
             if not ok:
                 break
             frame_count += 1
+            timer.count("frames")
+            if progress is not None:
+                progress.frame(frame_count, total_frames)
             if frame_count % FRAME_SKIP != 0:
                 continue
 
-            orig = frame.copy()
-            resized = cv2.resize(orig, (IMG_SIZE, IMG_SIZE))
+            with timer.stage("preprocess"):
+                orig = frame.copy()
+                resized = cv2.resize(orig, (IMG_SIZE, IMG_SIZE))
             batch_frames.append(resized)
             batch_orig.append(orig)
+            batch_ids.append(frame_count)
 
             if len(batch_frames) >= BATCH_SIZE:
-                results = model.predict(batch_frames, imgsz=IMG_SIZE, conf=0.30, verbose=False, device=device)
-                for idx, r in enumerate(results):
-                    frame_orig = batch_orig[idx]
-                    scale_x = frame_orig.shape[1] / IMG_SIZE
-                    scale_y = frame_orig.shape[0] / IMG_SIZE
-
-                    filtered_dets = []
-                    if getattr(r, "boxes", None) is not None and len(r.boxes) > 0:
-                        xyxy = r.boxes.xyxy.cpu().numpy()
-                        cls_ids = r.boxes.cls.cpu().numpy().astype(int)
-                        confs = r.boxes.conf.cpu().numpy()
-                        names = r.names
-
-                        for box, cid, conf in zip(xyxy, cls_ids, confs):
-                            cls_name = names.get(int(cid), str(cid)).lower()
-                            if cls_name in IGNORED_CLASSES: continue
-                            if cls_name not in WHITELIST_CLASSES: continue
-                            if conf < MIN_CONF_DEFAULT: continue
-
-                            x1, y1, x2, y2 = box
-                            x1 *= scale_x; x2 *= scale_x; y1 *= scale_y; y2 *= scale_y
-                            bbox = [x1, y1, x2, y2]
-
-                            if (y2 - y1) < MIN_BBOX_HEIGHT_PX or bbox_area(bbox) < MIN_BBOX_AREA_PX: continue
-                            if not is_in_rail_roi(bbox, frame_orig.shape): continue
-
-                            gx = int(center_of_bbox(bbox)[0] // 20)
-                            gy = int(center_of_bbox(bbox)[1] // 20)
-                            key = (cls_name, gx, gy)
-                            st = persistence.get(key, {"count": 0, "last": 0})
-                            if frame_count - st["last"] > FORGET_FRAMES:
-                                st = {"count": 0, "last": 0}
-
-                            st["count"] += 1
-                            st["last"] = frame_count
-                            persistence[key] = st
-
-                            if st["count"] >= PERSISTENCE_FRAMES:
-                                filtered_dets.append({"bbox": bbox, "cls": cls_name, "conf": float(conf)})
-
-                    draw_frame = frame_orig.copy()
-                    per_frame_risks = []
-                    per_frame_decisions = []
-                    for d in filtered_dets:
-                        dist = estimate_distance_from_bbox(d["bbox"])
-                        ttc = dist / max(0.1, sim_speed / 3.6)
-                        score = risk_score(dist, d["conf"], d["cls"], sim_speed)
-                        decision = ai_decision(dist, ttc, sim_speed, d["cls"])
-
-                        x1, y1, x2, y2 = map(int, d["bbox"])
-                        color = (0, 255, 0) if decision == "CLEAR" else (0, 165, 255) if decision in ["SLOW_DOWN", "CAUTION"] else (0, 0, 255)
-                        cv2.rectangle(draw_frame, (x1, y1), (x2, y2), color, 2)
-                        cv2.putText(draw_frame, f"{d['cls']} {d['conf']:.2f} {decision}", (x1, max(20, y1 - 5)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-                        if decision != "CLEAR":
-                            crop = frame_orig[max(0, y1):min(frame_orig.shape[0], y2), max(0, x1):min(frame_orig.shape[1], x2)]
-                            if crop.size > 0:
-                                crop_name = f"{snaps_dir}/{frame_count}_{d['cls']}_{uuid.uuid4().hex[:6]}.jpg"
-                                cv2.imwrite(crop_name, crop)
-                                try:
-                                    thumb = cv2.resize(crop, (140, 80))
-                                    RECENT_THUMBNAILS.append(thumb)
-                                except Exception:
-                                    pass
-
-                            alerts.append({
-                                "time_s": round(time.time() - start_t, 2),
-                                "frame": frame_count,
-                                "label": d["cls"],
-                                "conf": round(d["conf"], 2),
-                                "distance_m": round(dist, 1),
-                                "ttc_s": round(ttc, 1),
-                                "decision": decision,
-                                "risk_score": round(score, 1),
-                                "lat": get_gps_from_route(frame_count)[0],
-                                "lon": get_gps_from_route(frame_count)[1],
-                            })
-
-                        per_frame_risks.append(score)
-                        per_frame_decisions.append(decision)
-
-                    if not per_frame_risks:
-                        overall_risk = 0.0
-                        overall_decision = "CLEAR"
-                    else:
-                        overall_risk = float(np.clip(max(per_frame_risks), 0, 100))
-                        if any(d == "BRAKE_EMERGENCY" for d in per_frame_decisions):
-                            overall_decision = "BRAKE_EMERGENCY"
-                        elif any(d == "SLOW_DOWN" for d in per_frame_decisions):
-                            overall_decision = "SLOW_DOWN"
-                        elif any(d == "CAUTION" for d in per_frame_decisions):
-                            overall_decision = "CAUTION"
-                        else:
-                            overall_decision = "CLEAR"
-
-                    hud_frame = draw_hud(draw_frame, sim_speed, overall_decision, overall_risk, RECENT_THUMBNAILS)
-                    writer.write(hud_frame)
+                with timer.stage("predict"), model_call("object"):
+                    results = get_model().predict(batch_frames, imgsz=IMG_SIZE, conf=0.30, verbose=False, device=device)
+                timer.count("frames_inferred", len(batch_frames))
+                for frame_orig, frame_id, r in zip(batch_orig, batch_ids, results):
+                    timer.count("detections_raw", len(r.boxes) if getattr(r, "boxes", None) is not None else 0)
+                    with timer.stage("filter"):
+                        filtered_dets = _filter_detections(r, frame_orig, frame_id, persistence)
+                    timer.count("detections", len(filtered_dets))
+                    with timer.stage("score"):
+                        record = _score_frame(filtered_dets, frame_orig, frame_id, sim_speed, events, start_t)
+                    records.append(record)
+                    if writer is not None:
+                        with timer.stage("hud"):
+                            annotated = annotate_frame(frame_orig, record, sim_speed, RECENT_THUMBNAILS)
+                        with timer.stage("encode"):
+                            writer.write(annotated)
 
                 batch_frames.clear()
                 batch_orig.clear()
+                batch_ids.clear()
 
     finally:
         cap.release()
-        writer.release()
+        if writer is not None:
+            writer.release()
+
+    if progress is not None:
+        progress.frame(frame_count, total_frames, force=True)
+        progress.stage("outputs")
+
+    # per-frame detections: enough to re-render the annotated video later
+    with timer.stage("json"):
+        with open(out_detections, "w") as f:
+            json.dump({"source": os.path.abspath(input_path), "speed": sim_speed, "fps": out_fps,
+                       "size": [out_w, out_h], "frames": records}, f)
 
     # leftover frames processing (same logic; omitted here for brevity)
     # ... (you can reuse the batch-handling code above for leftovers if needed)
     # For simplicity, if leftover frames exist just process them inline (omitted to keep code readable)
 
+    # one row per hazard event instead of one per frame
+    alerts = events.finish()
+    timer.count("events", len(alerts))
+
     # Save CSV
-    if alerts:
-        pd.DataFrame(alerts).to_csv(out_csv, index=False)
-    else:
-        pd.DataFrame([{"frame": 0, "event": "No issues"}]).to_csv(out_csv, index=False)
+    with timer.stage("csv"):
+        import pandas as pd  # type: ignore  # imported on first use to keep API startup fast
+        if alerts:
+            pd.DataFrame(alerts).to_csv(out_csv, index=False)
+        else:
+            pd.DataFrame([{"frame": 0, "event": "No issues"}]).to_csv(out_csv, index=False)
 
     # Save map with markers
-    m = folium.Map(location=TRAIN_ROUTE[0], zoom_start=14)
-    for a in alerts:
-        color = "red" if "BRAKE" in a["decision"] else ("orange" if a["decision"] == "SLOW_DOWN" else "green")
-        folium.Marker([a["lat"], a["lon"]],
-                      popup=f"{a['label']} {a['distance_m']}m Risk:{a['risk_score']}",
-                      icon=folium.Icon(color=color)).add_to(m)
-    m.save(out_map)
+    with timer.stage("map"):
+        import folium  # type: ignore
+        m = folium.Map(location=TRAIN_ROUTE[0], zoom_start=14)
+        for a in alerts:
+            color = "red" if "BRAKE" in a["decision"] else ("orange" if a["decision"] == "SLOW_DOWN" else "green")
+            folium.Marker([a["lat"], a["lon"]],
+                          popup=f"{a['label']} {a['min_distance_m']}m Risk:{a['risk_score']} (frames {a['start_frame']}-{a['end_frame']})",
+                          icon=folium.Icon(color=color)).add_to(m)
+        m.save(out_map)
 
     # Convert intermediate out_video -> browser-safe AVC1 final file in same out_dir
-    final_video = f"{out_dir}/output_avc1.mp4"
-    convert_to_avc1(out_video, final_video)
-
-    return {"video": final_video, "csv": out_csv, "map": out_map, "snaps": snaps_dir}
\ No newline at end of file
+    final_video = f"{out_dir}/{FINAL_VIDEO_OUT}"
+    if render:
+        if progress is not None:
+            progress.stage("ffmpeg")
+        with timer.stage("ffmpeg"):
+            convert_to_avc1(out_video, final_video)
+    elif os.path.exists(final_video):
+        os.remove(final_video)  # belongs to an earlier run
+
+    return {"video": final_video if render else None, "detections": out_detections, "csv": out_csv, "map": out_map, "snaps": snaps_dir, "events": len(alerts)}
@@ -1,21 +1,68 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import os
+import json
+import shutil
+import threading
+import tarfile
+import zipfile
 import cv2
-import pandas as pd
-import folium
 import numpy as np
 import time
-from ultralytics import YOLO   # Using YOLO for track fault detection
+
+from events import EventAggregator
+from metrics import StageTimer, model_call
+from tiling import TiledDetector, TILE_SIZE
 
 # ---- Output filenames ---- #
 VIDEO_OUT = "output_track_fault.mp4"
 IMAGE_OUT = "output_track_fault.jpg"
 CSV_OUT   = "alerts_track_fault.csv"
 MAP_OUT   = "track_fault_map.html"
+DETECTIONS_OUT = "detections_track_fault.json"
+SNAPS_DIR = "track_fault_snaps"
+BULK_DIR  = "track_fault_bulk"
+BULK_ZIP  = "track_fault_bulk.zip"
+
+# ---- Bulk mode ---- #
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+ARCHIVE_EXTS = (".zip", ".tar", ".tgz", ".tar.gz")
+BULK_BATCH_SIZE = 16
+DECODE_WORKERS = min(8, os.cpu_count() or 4)
+
+DECISION_SEVERITY = {"SAFE": 0, "CAUTION": 1, "DANGER": 2}
+
+# ==== Model, loaded once on first use ==== #
+MODEL_PATH = Path(__file__).parent / "Model" / "track_fault_detection.pt"   # <-- put your trained model path here
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """The track fault model (YOLO), loaded once on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from ultralytics import YOLO  # type: ignore
+                _model = YOLO(str(MODEL_PATH))
+    return _model
+
+
+def set_model(m):
+    """Use another model object with the same call API (benchmarks, preloaded weights)."""
+    global _model
+    _model = m
+
+
+def model_loaded():
+    return _model is not None
+
 
-# ==== Load model once here ==== #
-MODEL_PATH = Path(__file__).parent / "Model" / "track_fault_detection.pt"
-print(f"DEBUG: Loading model from {MODEL_PATH}, exists={MODEL_PATH.exists()}")
-MODEL = YOLO(str(MODEL_PATH))   # <-- put your trained model path here
+def warmup(device="cpu"):
+    """Load the model and run one dummy image, so the first real request skips the setup cost."""
+    import pandas, folium  # noqa: F401  # the CSV/map writers' imports
+    get_model()(np.zeros((640, 640, 3), dtype=np.uint8), device=device, verbose=False)
 
 # ==== Risk scoring helpers ====
 def braking_distance_m(speed_kmph, reaction_time_s, decel_mps2):
@@ -35,128 +82,437 @@ def risk_score(distance_to_fault_m, speed_kmph, reaction_time_s, decel_mps2):
     return level, score
 
 
+def _result_dets(results):
+    """(x1, y1, x2, y2, conf, class name) for every box of one YOLO result."""
+    return [(*box.xyxy[0].tolist(), float(box.conf), results.names[int(box.cls)]) for box in results.boxes]
+
+
+def _predict_tiles(crops, device, timer):
+    """Tiled mode: one model call over a batch of full-resolution tiles."""
+    with timer.stage("predict"), model_call("track"):
+        results = get_model()(crops, device=device, verbose=False, imgsz=TILE_SIZE)
+    return [_result_dets(r) for r in results]
+
+
+def _tiler(tiled, device, timer, reuse=True):
+    return TiledDetector(lambda crops: _predict_tiles(crops, device, timer), timer, reuse=reuse) if tiled else None
+
+
+def _collect_faults(img, dets, frame_id, events, start_t, speed_kmph, reaction_time, decel, extra=None):
+    """Score every (x1, y1, x2, y2, conf, cls) box of one image and feed fault boxes into events.
+    Returns the boxes to draw."""
+    boxes = []
+    for x1, y1, x2, y2, conf, cls_name in dets:
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+
+        if "fault" in cls_name.lower() or "defect" in cls_name.lower():
+            dist = 50.0
+            decision, risk_pct = risk_score(dist, speed_kmph, reaction_time, decel)
+
+            crop = img[max(0, y1):max(0, y2), max(0, x1):max(0, x2)]
+            row = {
+                "frame": frame_id,
+                "time": round(time.time()-start_t,2),
+                "issue": cls_name,
+                "conf": round(conf,2),
+                "distance_m": dist,
+                "risk_pct": risk_pct
+            }
+            if extra:
+                row.update(extra)
+            events.add(frame_id, cls_name, [x1, y1, x2, y2], row,
+                       risk=risk_pct, distance=dist, decision=decision, crop=crop)
+            fault = True
+        else:
+            decision, risk_pct = "SAFE", 0
+            fault = False
+
+        boxes.append({"bbox": [x1, y1, x2, y2], "cls": cls_name, "conf": round(conf, 4),
+                      "decision": decision, "risk_pct": risk_pct, "fault": fault})
+    return boxes
+
+
+def _draw_fault_boxes(img, boxes):
+    for b in boxes:
+        x1, y1, x2, y2 = b["bbox"]
+        decision = b["decision"]
+        if b["fault"]:
+            color = (0,255,0) if decision=="SAFE" else (0,255,255) if decision=="CAUTION" else (0,0,255)
+        else:
+            color = (0,200,0)
+        label = f"{b['cls']} {b['conf']:.2f} {decision} {b['risk_pct']:.0f}%"
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(img, label, (x1, max(20, y1-10)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    return img
+
+
+def _save_alerts(alerts, out_dir, timer):
+    """Write the alert CSV and the folium map for a list of event rows."""
+    timer.count("events", len(alerts))
+    csv_path = out_dir / CSV_OUT
+    with timer.stage("csv"):
+        import pandas as pd  # imported on first use to keep API startup fast
+        pd.DataFrame(alerts).to_csv(csv_path, index=False)
+
+    map_path = out_dir / MAP_OUT
+    with timer.stage("map"):
+        import folium
+        m = folium.Map(location=[28.61, 77.23], zoom_start=12)
+        for i, row in enumerate(alerts):
+            folium.Marker(
+                location=[28.61 + i*0.001, 77.23 + i*0.001],
+                popup=f"{row['issue']} {row['decision']} ({row['risk_pct']:.0f}%)",
+                icon=folium.Icon(color="red" if row["decision"]=="DANGER" else "orange")
+            ).add_to(m)
+        m.save(str(map_path))
+    return csv_path, map_path
+
+
+def _timed(pipeline, timer, fn, *args):
+    """Run fn(*args, timer) and return its result with the job's stage timings under "timings"."""
+    timer = timer or StageTimer(pipeline)
+    try:
+        results = fn(*args, timer)
+    except BaseException:
+        timer.finish("error")
+        raise
+    results["timings"] = timer.finish()
+    return results
+
+
+_render_lock = threading.Lock()
+
+
+def render_track_video(out_dir: str = "outputs") -> str:
+    """
+    Build the annotated track fault video of the last video run in out_dir from its
+    stored boxes and the source video. The result is cached until the next run.
+    """
+    out_dir = Path(out_dir)
+    detections_path = out_dir / DETECTIONS_OUT
+    out_path = out_dir / VIDEO_OUT
+    with _render_lock:
+        if out_path.exists() and out_path.stat().st_mtime >= detections_path.stat().st_mtime:
+            return str(out_path)
+
+        _timed("track_render", None, _render_track_video, detections_path, out_path)
+        return str(out_path)
+
+
+def _render_track_video(detections_path, out_path, timer):
+    with open(detections_path) as f:
+        stored = json.load(f)
+    by_frame = {r["frame"]: r["boxes"] for r in stored["frames"]}
+
+    cap = cv2.VideoCapture(stored["source"])
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open source video {stored['source']}")
+    out = cv2.VideoWriter(str(out_path), cv2.VideoWriter_fourcc(*"mp4v"), stored["fps"], tuple(stored["size"]))
+    frame_id = 0
+    try:
+        while True:
+            with timer.stage("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+            frame_id += 1
+            timer.count("frames")
+            with timer.stage("hud"):
+                frame = _draw_fault_boxes(frame, by_frame.get(frame_id, []))
+            with timer.stage("encode"):
+                out.write(frame)
+    finally:
+        cap.release()
+        out.release()
+    return {"video": str(out_path)}
+
+
 def run_inference_trackfault(input_path: str, device: str = "cpu", out_dir: str = "outputs",
-                             speed_kmph: float = 80.0, reaction_time: float = 1.0, decel: float = 1.0) -> dict:
+                             speed_kmph: float = 80.0, reaction_time: float = 1.0, decel: float = 1.0,
+                             render: bool = True, tiled: bool = False, timer: StageTimer = None,
+                             progress=None) -> dict:
     """
     Run track fault detection using trained YOLO model (loaded inside file).
+    With render=False a video input only yields detections, CSV and map; the
+    annotated video is built on demand by render_track_video().
+    tiled=True runs the rail region at full resolution in overlapping tiles (see
+    tiling.py), for small defects on high-resolution footage; tile counts are
+    returned under "tiling".
+    Stage timings are returned under "timings"; `progress` (a progress.JobProgress)
+    receives frame counts and new faults as they are found.
     """
+    inp = Path(input_path)
+    if inp.is_dir() or inp.name.lower().endswith(ARCHIVE_EXTS):
+        return run_inference_trackfault_bulk(input_path, device, str(out_dir), speed_kmph, reaction_time, decel,
+                                             tiled=tiled, timer=timer, progress=progress)
+    return _timed("track", timer, _run_trackfault, inp, device, Path(out_dir), speed_kmph, reaction_time, decel,
+                  render, tiled, progress)
 
-    out_dir = Path(out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
 
-    inp = Path(input_path)
+def _run_trackfault(inp, device, out_dir, speed_kmph, reaction_time, decel, render, tiled, progress, timer):
+    out_dir.mkdir(parents=True, exist_ok=True)
     ext = inp.suffix.lower()
-    alerts = []
+
+    events = EventAggregator(DECISION_SEVERITY, snaps_dir=str(out_dir / SNAPS_DIR),
+                             on_new=progress.alert if progress is not None else None)
     start_t = time.time()
+    tiler = _tiler(tiled, device, timer)
 
     # ---- Video mode ----
     if ext in [".mp4", ".avi", ".mov"]:
         cap = cv2.VideoCapture(str(inp))
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+        events.fps = fps or None
         out_path = out_dir / VIDEO_OUT
-        out = cv2.VideoWriter(str(out_path), fourcc, cap.get(cv2.CAP_PROP_FPS),
-                              (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))))
+        # alerts-only mode: no drawing or encoding, render_track_video() does it on demand
+        out = cv2.VideoWriter(str(out_path), cv2.VideoWriter_fourcc(*"mp4v"), fps, size) if render else None
+        if not render and out_path.exists():
+            out_path.unlink()  # belongs to an earlier run
+        (out_dir / IMAGE_OUT).unlink(missing_ok=True)  # so is any image
+
+        records = {}
+
+        def handle(frame_id, frame, dets):
+            with timer.stage("score"):
+                boxes = _collect_faults(frame, dets, frame_id, events, start_t, speed_kmph, reaction_time, decel)
+            timer.count("detections", len(boxes))
+            if boxes:
+                records[frame_id] = boxes
+
+            if out is not None:
+                with timer.stage("hud"):
+                    frame = _draw_fault_boxes(frame, boxes)
+                with timer.stage("encode"):
+                    out.write(frame)
 
         frame_id = 0
         while True:
-            ret, frame = cap.read()
+            with timer.stage("decode"):
+                ret, frame = cap.read()
             if not ret:
                 break
             frame_id += 1
+            timer.count("frames")
+            if progress is not None:
+                progress.frame(frame_id, total_frames)
 
-            results = MODEL(frame, device=device, verbose=False)[0]
-
-            for box in results.boxes:
-                cls_id = int(box.cls)
-                cls_name = MODEL.names[cls_id]
-                conf = float(box.conf)
-                x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-
-                if "fault" in cls_name.lower() or "defect" in cls_name.lower():
-                    dist = 50.0
-                    decision, risk_pct = risk_score(dist, speed_kmph, reaction_time, decel)
-                    color = (0,255,0) if decision=="SAFE" else (0,255,255) if decision=="CAUTION" else (0,0,255)
-
-                    alerts.append({
-                        "frame": frame_id,
-                        "time": round(time.time()-start_t,2),
-                        "issue": cls_name,
-                        "conf": round(conf,2),
-                        "distance_m": dist,
-                        "decision": decision,
-                        "risk_pct": risk_pct
-                    })
-                else:
-                    decision, risk_pct = "SAFE", 0
-                    color = (0,200,0)
-
-                label = f"{cls_name} {conf:.2f} {decision} {risk_pct:.0f}%"
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(frame, label, (x1, max(20, y1-10)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-            out.write(frame)
+            if tiler is not None:
+                # frames come back once their tiles have been through a batch
+                for done in tiler.submit(frame_id, frame):
+                    handle(*done)
+                continue
+            with timer.stage("predict"), model_call("track"):
+                results = get_model()(frame, device=device, verbose=False)[0]
+            handle(frame_id, frame, _result_dets(results))
 
+        if tiler is not None:
+            for done in tiler.flush():
+                handle(*done)
         cap.release()
-        out.release()
+        if out is not None:
+            out.release()
+        if progress is not None:
+            progress.frame(frame_id, total_frames, force=True)
+            progress.stage("outputs")
+
+        # per-frame boxes: enough to re-render the annotated video later
+        with timer.stage("json"), open(out_dir / DETECTIONS_OUT, "w") as f:
+            json.dump({"source": str(inp.resolve()), "fps": fps, "size": list(size),
+                       "frames": [{"frame": k, "boxes": v} for k, v in records.items()]}, f)
+        if render:
+            os.utime(out_path)  # mark the rendered video as up to date with the detections
 
     # ---- Image mode ----
     elif ext in [".jpg", ".jpeg", ".png"]:
-        img = cv2.imread(str(inp))
+        # an earlier video run's outputs would otherwise be served (or lazily rendered) for this job
+        with _render_lock:
+            (out_dir / VIDEO_OUT).unlink(missing_ok=True)
+            (out_dir / DETECTIONS_OUT).unlink(missing_ok=True)
+        with timer.stage("decode"):
+            img = cv2.imread(str(inp))
         out_path = out_dir / IMAGE_OUT
+        timer.count("images")
 
-        results = MODEL(img, device=device, verbose=False)[0]
-
-        for box in results.boxes:
-            cls_id = int(box.cls)
-            cls_name = MODEL.names[cls_id]
-            conf = float(box.conf)
-            x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-
-            if "fault" in cls_name.lower() or "defect" in cls_name.lower():
-                dist = 50.0
-                decision, risk_pct = risk_score(dist, speed_kmph, reaction_time, decel)
-                color = (0,255,0) if decision=="SAFE" else (0,255,255) if decision=="CAUTION" else (0,0,255)
-
-                alerts.append({
-                    "frame": 0,
-                    "time": round(time.time()-start_t,2),
-                    "issue": cls_name,
-                    "conf": round(conf,2),
-                    "distance_m": dist,
-                    "decision": decision,
-                    "risk_pct": risk_pct
-                })
-            else:
-                decision, risk_pct = "SAFE", 0
-                color = (0,200,0)
+        if tiler is not None:
+            dets = (tiler.submit(0, img) + tiler.flush())[0][2]
+        else:
+            with timer.stage("predict"), model_call("track"):
+                dets = _result_dets(get_model()(img, device=device, verbose=False)[0])
 
-            label = f"{cls_name} {conf:.2f} {decision} {risk_pct:.0f}%"
-            cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(img, label, (x1, max(20, y1-10)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        with timer.stage("score"):
+            boxes = _collect_faults(img, dets, 0, events, start_t, speed_kmph, reaction_time, decel)
+        timer.count("detections", len(boxes))
+        with timer.stage("hud"):
+            _draw_fault_boxes(img, boxes)
 
-        cv2.imwrite(str(out_path), img)
+        with timer.stage("encode"):
+            cv2.imwrite(str(out_path), img)
 
     else:
         raise ValueError(f"Unsupported input type: {ext}")
 
-    # ---- Save CSV ---- #
-    csv_path = out_dir / CSV_OUT
-    pd.DataFrame(alerts).to_csv(csv_path, index=False)
+    # one row per fault event instead of one per frame and box
+    alerts = events.finish()
 
-    # ---- Save map ---- #
-    map_path = out_dir / MAP_OUT
-    m = folium.Map(location=[28.61, 77.23], zoom_start=12)
-    for i, row in enumerate(alerts):
-        folium.Marker(
-            location=[28.61 + i*0.001, 77.23 + i*0.001],
-            popup=f"{row['issue']} {row['decision']} ({row['risk_pct']:.0f}%)",
-            icon=folium.Icon(color="red" if row["decision"]=="DANGER" else "orange")
-        ).add_to(m)
-    m.save(str(map_path))
+    csv_path, map_path = _save_alerts(alerts, out_dir, timer)
 
     return {
         "video": str(out_dir / VIDEO_OUT) if (out_dir / VIDEO_OUT).exists() else None,
+        "detections": str(out_dir / DETECTIONS_OUT) if ext in [".mp4", ".avi", ".mov"] else None,
         "image": str(out_dir / IMAGE_OUT) if (out_dir / IMAGE_OUT).exists() else None,
         "csv": str(csv_path),
-        "map": str(map_path)
+        "map": str(map_path),
+        "events": len(alerts),
+        "tiling": tiler.info() if tiler is not None else None,
+    }
+
+
+# ==== Bulk mode: directories and zip/tar archives of inspection photos ==== #
+def _iter_bulk_images(source: Path):
+    """Yield (name, encoded bytes) for every image in a directory, zip or tar archive, without extracting it."""
+    if source.is_dir():
+        for p in sorted(source.rglob("*")):
+            if p.is_file() and p.suffix.lower() in IMAGE_EXTS:
+                yield str(p.relative_to(source)), p.read_bytes()
+    elif source.suffix.lower() == ".zip":
+        with zipfile.ZipFile(source) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTS):
+                    yield info.filename, zf.read(info)
+    else:
+        # "r|*" reads the tar sequentially, so compressed archives are streamed once
+        with tarfile.open(source, "r|*") as tf:
+            for member in tf:
+                if member.isfile() and member.name.lower().endswith(IMAGE_EXTS):
+                    yield member.name, tf.extractfile(member).read()
+
+
+def _decode_image(item, timer):
+    name, data = item
+    with timer.stage("decode"):
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return name, img
+
+
+def _iter_decoded_batches(items, pool, batch_size, timer):
+    """Decode images on the pool, one batch ahead of the batch currently being inferred."""
+    pending = None
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            futures = [pool.submit(_decode_image, it, timer) for it in batch]
+            batch = []
+            if pending is not None:
+                yield [f.result() for f in pending]
+            pending = futures
+    if batch:
+        futures = [pool.submit(_decode_image, it, timer) for it in batch]
+        if pending is not None:
+            yield [f.result() for f in pending]
+        pending = futures
+    if pending is not None:
+        yield [f.result() for f in pending]
+
+
+def run_inference_trackfault_bulk(input_path: str, device: str = "cpu", out_dir: str = "outputs",
+                                  speed_kmph: float = 80.0, reaction_time: float = 1.0, decel: float = 1.0,
+                                  tiled: bool = False, timer: StageTimer = None, progress=None) -> dict:
+    """
+    Run track fault detection over every image in a directory or zip/tar archive.
+    Images are decoded in parallel and inferred in batches; only images with a fault
+    are annotated and written, and all faults go to one consolidated alert CSV.
+    tiled=True infers every image in full-resolution tiles of its rail region.
+    Stage timings are returned under "timings" (decode time is summed over the workers);
+    `progress` gets the image count (the total is not known up front) and new faults.
+    """
+    return _timed("track_bulk", timer, _run_trackfault_bulk, input_path, device, Path(out_dir), speed_kmph,
+                  reaction_time, decel, tiled, progress)
+
+
+def _run_trackfault_bulk(input_path, device, out_dir, speed_kmph, reaction_time, decel, tiled, progress, timer):
+    bulk_dir = out_dir / BULK_DIR
+    if bulk_dir.exists():
+        shutil.rmtree(bulk_dir)
+    bulk_dir.mkdir(parents=True)
+
+    source = Path(input_path)
+    # every photo is its own scene, so events never span two images
+    events = EventAggregator(DECISION_SEVERITY, snaps_dir=str(out_dir / SNAPS_DIR), max_gap=0,
+                             on_new=progress.alert if progress is not None else None)
+    start_t = time.time()
+    n_images = n_positive = n_unreadable = 0
+    # photos are unrelated, so no tile is ever reused from the previous one
+    tiler = _tiler(tiled, device, timer, reuse=False)
+
+    def handle(index, name, img, dets):
+        """Score one image and write it annotated if it shows a fault; True when it does."""
+        if not dets:
+            return False
+        with timer.stage("score"):
+            boxes = _collect_faults(img, dets, index, events, start_t, speed_kmph, reaction_time, decel,
+                                    extra={"image": name})
+        timer.count("detections", len(boxes))
+        if not any(b["fault"] for b in boxes):
+            return False
+        flat_name = name.replace("/", "__").replace("\\", "__")
+        with timer.stage("hud"):
+            _draw_fault_boxes(img, boxes)
+        with timer.stage("encode"):
+            # keep the source extension, so a.png and a.jpg do not overwrite each other
+            cv2.imwrite(str(bulk_dir / f"{flat_name}.jpg"), img)
+        return True
+
+    with ThreadPoolExecutor(max_workers=DECODE_WORKERS) as pool:
+        for batch in _iter_decoded_batches(_iter_bulk_images(source), pool, BULK_BATCH_SIZE, timer):
+            readable = [(name, img) for name, img in batch if img is not None]
+            n_unreadable += len(batch) - len(readable)
+            if not readable:
+                continue
+
+            if tiler is not None:
+                scored = [done for name, img in readable for done in tiler.submit(name, img)]
+            else:
+                with timer.stage("predict"), model_call("track"):
+                    results = get_model()([img for _, img in readable], device=device, verbose=False)
+                scored = [(name, img, _result_dets(r)) for (name, img), r in zip(readable, results)]
+            for name, img, dets in scored:
+                n_images += 1
+                n_positive += handle(n_images, name, img, dets)
+            if progress is not None:
+                progress.frame(n_images + n_unreadable)
+
+    if tiler is not None:
+        for name, img, dets in tiler.flush():
+            n_images += 1
+            n_positive += handle(n_images, name, img, dets)
+
+    elapsed = max(1e-6, time.time() - start_t)
+    timer.count("images", n_images)
+    if progress is not None:
+        progress.frame(n_images + n_unreadable, force=True)
+        progress.stage("outputs")
+    alerts = events.finish()
+    csv_path, map_path = _save_alerts(alerts, out_dir, timer)
+
+    # annotated positives as one download; JPEGs are already compressed, so store only
+    zip_path = out_dir / BULK_ZIP
+    with timer.stage("zip"), zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for p in sorted(bulk_dir.iterdir()):
+            zf.write(p, arcname=p.name)
+
+    return {
+        "video": None,
+        "image": None,
+        "bulk": str(zip_path),
+        "csv": str(csv_path),
+        "map": str(map_path),
+        "events": len(alerts),
+        "images": n_images,
+        "positives": n_positive,
+        "unreadable": n_unreadable,
+        "images_per_s": round(n_images / elapsed, 2),
+        "tiling": tiler.info() if tiler is not None else None,
     }
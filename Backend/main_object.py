@@ -1,18 +1,26 @@
-from fastapi import FastAPI, UploadFile, Form, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse, FileResponse, HTMLResponse
+from fastapi import FastAPI, UploadFile, Form, HTTPException, Request
+from fastapi.responses import JSONResponse, HTMLResponse
 from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
-import shutil
+from typing import Optional
+import os
 from train_fault_3dsimulation import router as train_router
 from train_obstacle_3dsimulation import router as obstacle_router
-
-import sys
-print(f"DEBUG: sys.path: {sys.path}")
-from inference_object import run_inference          # object detection
-import inference_track
-print(f"DEBUG: inference_track file: {inference_track.__file__}")
-from inference_track import run_inference_trackfault  # track fault detection
+from braking_sweep import router as sweep_router
+from sim_network import router as network_router
+from uploads import router as uploads_router, save_upload, claim_upload, upload_path, UploadLimitMiddleware
+from artifacts import serve_artifact
+from metrics import router as metrics_router, StageTimer
+from profiling import router as profiling_router, new_profile, run_profiled
+from sim_service import stop_service
+from readiness import router as readiness_router, start_warmup
+from admission import router as admission_router, admit
+from progress import router as progress_router, open_job
+
+# models, Panda3D, pandas and folium load on first use (or in warmup), keeping startup fast
+from inference_object import run_inference, render_video          # object detection
+from inference_track import run_inference_trackfault, run_inference_trackfault_bulk, render_track_video  # track fault detection
 
 app = FastAPI(title="Suraksha Rail API", version="2.0")
 
@@ -24,6 +32,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# oversized analyze uploads get 413 before the body is received and spooled
+app.add_middleware(UploadLimitMiddleware)
 
 # ---------------- DIRECTORIES ---------------- #
 BASE_DIR = Path(__file__).parent.resolve()
@@ -32,131 +42,250 @@ OUT_DIR = BASE_DIR / "outputs"
 UPLOAD_DIR.mkdir(exist_ok=True)
 OUT_DIR.mkdir(exist_ok=True)
 
-CHUNK_SIZE = 1024 * 1024  # 1MB
+# server-side folders that /analyze/track/bulk may read from (unset = uploads only)
+BULK_ROOT = Path(os.environ["SURAKSHA_BULK_ROOT"]).resolve() if os.environ.get("SURAKSHA_BULK_ROOT") else None
+
+async def receive_upload(file: Optional[UploadFile], upload_id: Optional[str], timer: StageTimer = None) -> dict:
+    """Stream a multipart upload to UPLOAD_DIR, or take over a completed resumable upload."""
+    if upload_id:
+        return await run_in_threadpool(claim_upload, upload_id, UPLOAD_DIR)
+    if file is None:
+        raise HTTPException(status_code=400, detail="Provide a file or an upload_id")
+    return await save_upload(file, upload_path(UPLOAD_DIR, file.filename), timer=timer)
 
 
-def iterfile(path: Path):
-    """Stream a file in chunks."""
-    with open(path, "rb") as f:
-        while chunk := f.read(CHUNK_SIZE):
-            yield chunk
+def _upload_info(upload: Optional[dict]):
+    return {"sha256": upload["sha256"], "size": upload["size"]} if upload else None
 
 
 # =====================================================
 # OBJECT DETECTION ENDPOINT
 # =====================================================
 @app.post("/analyze/object")
-async def analyze_object(file: UploadFile, speed: float = Form(80.0)):
-    """Upload video -> run OBJECT detection -> return artifact URLs."""
-    dest = UPLOAD_DIR / Path(file.filename).name
-    with open(dest, "wb") as out_f:
-        shutil.copyfileobj(file.file, out_f)
-
-    try:
-        results = await run_in_threadpool(run_inference, str(dest), float(speed), "cpu")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Object inference error: {e}")
-
-    artifacts = {
-        "video": "/download/video",
-        "csv": "/download/csv",
-        "map": "/download/map",
-    }
-
-    return JSONResponse(content={"message": "Object detection complete", "artifacts": artifacts})
+async def analyze_object(file: Optional[UploadFile] = None, speed: float = Form(80.0), render: bool = Form(True),
+                         upload_id: Optional[str] = Form(None), priority: str = Form("standard"),
+                         job_id: Optional[str] = Form(None), profile: bool = Form(False),
+                         profile_mode: str = Form("sample")):
+    """Upload video (or pass a resumable upload_id) -> run OBJECT detection -> return artifact URLs.
+    render=false skips drawing/encoding; the video is rendered on first download.
+    priority (live/standard/batch) orders the job queue; 429 + Retry-After when it is full.
+    job_id names the job's progress stream at /jobs/{job_id}/events.
+    profile=true runs the job under a profiler and links its artifacts."""
+    prof = new_profile("object", profile_mode) if profile else None
+    with open_job(job_id, "object") as job:
+        async with admit("object", priority) as ticket:
+            job.started(ticket.info())
+            timer = StageTimer("object")
+            try:
+                upload = await receive_upload(file, upload_id, timer)
+                dest = Path(upload["path"])
+                results = await run_in_threadpool(run_profiled, prof, run_inference, str(dest), float(speed), "cpu",
+                                                  str(OUT_DIR), render, timer, progress=job)
+            except HTTPException:
+                timer.finish("error")
+                raise
+            except Exception as e:
+                timer.finish("error")
+                raise HTTPException(status_code=500, detail=f"Object inference error: {e}")
+
+        artifacts = {
+            "video": "/download/video",
+            "csv": "/download/csv",
+            "map": "/download/map",
+        }
+        job.finish({"message": "Object detection complete", "events": results.get("events"), "artifacts": artifacts})
+
+    return JSONResponse(content={"message": "Object detection complete", "job_id": job.job_id,
+                                 "events": results.get("events"), "upload": _upload_info(upload),
+                                 "artifacts": artifacts, "timings": results.get("timings"),
+                                 "admission": ticket.info(), "profile": prof.info() if prof else None})
 
 
 # =====================================================
 # TRACK FAULT DETECTION ENDPOINT
 # =====================================================
 @app.post("/analyze/track")
-async def analyze_track(file: UploadFile):
-    """Upload video/image -> run TRACK FAULT detection -> return artifact URLs."""
-    dest = UPLOAD_DIR / Path(file.filename).name
-    with open(dest, "wb") as out_f:
-        shutil.copyfileobj(file.file, out_f)
-
-    try:
-        results = await run_in_threadpool(run_inference_trackfault, str(dest), "cpu", str(OUT_DIR))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Track fault inference error: {e}")
-
-    artifacts = {
-        "video": "/download/track/video" if results.get("video") else None,
-        "image": "/download/track/image" if results.get("image") else None,
-        "csv": "/download/track/csv",
-        "map": "/download/track/map",
-    }
-
-    return JSONResponse(content={"message": "Track fault detection complete", "artifacts": artifacts})
+async def analyze_track(file: Optional[UploadFile] = None, render: bool = Form(True), tiled: bool = Form(False),
+                        upload_id: Optional[str] = Form(None), priority: str = Form("standard"),
+                        job_id: Optional[str] = Form(None), profile: bool = Form(False),
+                        profile_mode: str = Form("sample")):
+    """Upload video/image (or pass a resumable upload_id) -> run TRACK FAULT detection -> return artifact URLs.
+    render=false skips drawing/encoding for videos; the video is rendered on first download.
+    tiled=true infers the rail region in full-resolution tiles, for small defects on HD/4K footage.
+    priority (live/standard/batch) orders the job queue; 429 + Retry-After when it is full.
+    job_id names the job's progress stream at /jobs/{job_id}/events.
+    profile=true runs the job under a profiler and links its artifacts."""
+    prof = new_profile("track", profile_mode) if profile else None
+    with open_job(job_id, "track") as job:
+        async with admit("track", priority) as ticket:
+            job.started(ticket.info())
+            timer = StageTimer("track")
+            try:
+                upload = await receive_upload(file, upload_id, timer)
+                dest = Path(upload["path"])
+                results = await run_in_threadpool(run_profiled, prof, run_inference_trackfault, str(dest), "cpu",
+                                                  str(OUT_DIR), render=render, tiled=tiled, timer=timer,
+                                                  progress=job)
+            except HTTPException:
+                timer.finish("error")
+                raise
+            except Exception as e:
+                timer.finish("error")
+                raise HTTPException(status_code=500, detail=f"Track fault inference error: {e}")
+
+        artifacts = {
+            "video": "/download/track/video" if results.get("video") or results.get("detections") else None,
+            "image": "/download/track/image" if results.get("image") else None,
+            "bulk": "/download/track/bulk" if results.get("bulk") else None,
+            "csv": "/download/track/csv",
+            "map": "/download/track/map",
+        }
+        job.finish({"message": "Track fault detection complete", "events": results.get("events"),
+                    "artifacts": artifacts})
+
+    return JSONResponse(content={"message": "Track fault detection complete", "job_id": job.job_id,
+                                 "events": results.get("events"), "upload": _upload_info(upload),
+                                 "artifacts": artifacts, "tiling": results.get("tiling"),
+                                 "timings": results.get("timings"),
+                                 "admission": ticket.info(), "profile": prof.info() if prof else None})
+
+
+@app.post("/analyze/track/bulk")
+async def analyze_track_bulk(file: Optional[UploadFile] = None, directory: Optional[str] = Form(None),
+                             tiled: bool = Form(False), upload_id: Optional[str] = Form(None),
+                             priority: str = Form("batch"), job_id: Optional[str] = Form(None),
+                             profile: bool = Form(False), profile_mode: str = Form("sample")):
+    """Upload a zip/tar of images, or name a folder under SURAKSHA_BULK_ROOT -> bulk TRACK FAULT detection.
+    Queued as a batch job on the track model unless another priority is given.
+    tiled=true infers each image in full-resolution tiles of its rail region."""
+    upload = None
+    prof = new_profile("track_bulk", profile_mode) if profile else None
+    with open_job(job_id, "track_bulk") as job:
+        async with admit("track", priority) as ticket:
+            job.started(ticket.info())
+            timer = StageTimer("track_bulk")
+            try:
+                if file is not None or upload_id:
+                    upload = await receive_upload(file, upload_id, timer)
+                    source = Path(upload["path"])
+                elif directory:
+                    if BULK_ROOT is None:
+                        raise HTTPException(status_code=403, detail="Server-side bulk directories are disabled")
+                    source = (BULK_ROOT / directory).resolve()
+                    if not source.is_relative_to(BULK_ROOT) or not source.is_dir():
+                        raise HTTPException(status_code=404, detail="Bulk directory not found")
+                else:
+                    raise HTTPException(status_code=400, detail="Provide an archive file or a directory")
+
+                results = await run_in_threadpool(run_profiled, prof, run_inference_trackfault_bulk, str(source),
+                                                  "cpu", str(OUT_DIR), tiled=tiled, timer=timer, progress=job)
+            except HTTPException:
+                timer.finish("error")
+                raise
+            except Exception as e:
+                timer.finish("error")
+                raise HTTPException(status_code=500, detail=f"Bulk track fault inference error: {e}")
+
+        artifacts = {
+            "bulk": "/download/track/bulk",
+            "csv": "/download/track/csv",
+            "map": "/download/track/map",
+        }
+        stats = {k: results[k] for k in ("images", "positives", "unreadable", "images_per_s")}
+        job.finish({"message": "Bulk track fault detection complete", "events": results.get("events"),
+                    "stats": stats, "artifacts": artifacts})
+
+    return JSONResponse(content={"message": "Bulk track fault detection complete", "job_id": job.job_id,
+                                 "events": results.get("events"), "stats": stats, "upload": _upload_info(upload),
+                                 "artifacts": artifacts, "tiling": results.get("tiling"),
+                                 "timings": results.get("timings"),
+                                 "admission": ticket.info(), "profile": prof.info() if prof else None})
 
 
 # =====================================================
 # DOWNLOADS (OBJECT DETECTION)
 # =====================================================
+# All downloads support ETag/Last-Modified revalidation and byte ranges;
+# CSVs and maps are served from a cached gzip variant when the client accepts it.
 @app.get("/download/video")
-async def download_video():
-    video_file = OUT_DIR / "output_avc1.mp4"
-    if not video_file.exists():
+async def download_video(request: Request):
+    if not (OUT_DIR / "detections.json").exists():
         raise HTTPException(status_code=404, detail="Video not found")
-
-    return StreamingResponse(
-        iterfile(video_file),
-        media_type="video/mp4",
-        headers={"Accept-Ranges": "bytes"}
-    )
+    # renders from stored detections if the run was alerts-only, cached afterwards
+    video_file = Path(await run_in_threadpool(render_video, str(OUT_DIR)))
+    return await serve_artifact(request, video_file, "video/mp4", not_found="Video not found")
 
 
 @app.get("/download/csv")
-async def download_csv():
-    csv_file = OUT_DIR / "alerts.csv"
-    if not csv_file.exists():
-        raise HTTPException(status_code=404, detail="CSV not found")
-    return FileResponse(csv_file, media_type="text/csv", filename="alerts.csv")
+async def download_csv(request: Request):
+    return await serve_artifact(request, OUT_DIR / "alerts.csv", "text/csv", filename="alerts.csv",
+                                compressible=True, not_found="CSV not found")
 
 
 @app.get("/download/map", response_class=HTMLResponse)
-async def download_map():
-    map_file = OUT_DIR / "map.html"
-    if not map_file.exists():
-        raise HTTPException(status_code=404, detail="Map not found")
-    return HTMLResponse(content=map_file.read_text(encoding="utf-8"))
+async def download_map(request: Request):
+    return await serve_artifact(request, OUT_DIR / "map.html", "text/html; charset=utf-8",
+                                compressible=True, not_found="Map not found")
 
 
 # =====================================================
 # DOWNLOADS (TRACK FAULT)
 # =====================================================
 @app.get("/download/track/video")
-async def download_track_video():
-    video_file = OUT_DIR / "output_track_fault.mp4"
-    if not video_file.exists():
+async def download_track_video(request: Request):
+    if not (OUT_DIR / "detections_track_fault.json").exists():
         raise HTTPException(status_code=404, detail="Track fault video not found")
-    return FileResponse(video_file, media_type="video/mp4", filename="track_fault.mp4")
+    # renders from stored detections if the run was alerts-only, cached afterwards
+    video_file = Path(await run_in_threadpool(render_track_video, str(OUT_DIR)))
+    return await serve_artifact(request, video_file, "video/mp4", filename="track_fault.mp4",
+                                not_found="Track fault video not found")
 
 
 @app.get("/download/track/image")
-async def download_track_image():
-    img_file = OUT_DIR / "output_track_fault.jpg"
-    if not img_file.exists():
-        raise HTTPException(status_code=404, detail="Track fault image not found")
-    return FileResponse(img_file, media_type="image/jpeg", filename="track_fault.jpg")
+async def download_track_image(request: Request):
+    return await serve_artifact(request, OUT_DIR / "output_track_fault.jpg", "image/jpeg", filename="track_fault.jpg",
+                                not_found="Track fault image not found")
+
+
+@app.get("/download/track/bulk")
+async def download_track_bulk(request: Request):
+    return await serve_artifact(request, OUT_DIR / "track_fault_bulk.zip", "application/zip",
+                                filename="track_fault_bulk.zip", not_found="Bulk track fault images not found")
 
 
 @app.get("/download/track/csv")
-async def download_track_csv():
-    csv_file = OUT_DIR / "alerts_track_fault.csv"
-    if not csv_file.exists():
-        raise HTTPException(status_code=404, detail="Track fault CSV not found")
-    return FileResponse(csv_file, media_type="text/csv", filename="alerts_track_fault.csv")
+async def download_track_csv(request: Request):
+    return await serve_artifact(request, OUT_DIR / "alerts_track_fault.csv", "text/csv",
+                                filename="alerts_track_fault.csv", compressible=True,
+                                not_found="Track fault CSV not found")
 
 
 @app.get("/download/track/map", response_class=HTMLResponse)
-async def download_track_map():
-    map_file = OUT_DIR / "track_fault_map.html"
-    if not map_file.exists():
-        raise HTTPException(status_code=404, detail="Track fault map not found")
-    return HTMLResponse(content=map_file.read_text(encoding="utf-8"))
+async def download_track_map(request: Request):
+    return await serve_artifact(request, OUT_DIR / "track_fault_map.html", "text/html; charset=utf-8",
+                                compressible=True, not_found="Track fault map not found")
+
+# ---------------- WARMUP / SIMULATION WORKER ---------------- #
+@app.on_event("startup")
+async def warmup():
+    # SURAKSHA_WARMUP=object,track,simulation (or all) preloads those in the background; /ready reports progress.
+    # Otherwise each loads on first use: the Panda3D worker is spawned by the first simulation request.
+    start_warmup()
+
+
+@app.on_event("shutdown")
+async def stop_simulation_worker():
+    stop_service()
+
 
 # include routers
+app.include_router(uploads_router, prefix="/uploads", tags=["Resumable Uploads"])
 app.include_router(train_router, prefix="/simulation", tags=["Two Train Simulation"])
-app.include_router(obstacle_router, prefix="/simulation", tags=["Obstacle Simulation"])
\ No newline at end of file
+app.include_router(obstacle_router, prefix="/simulation", tags=["Obstacle Simulation"])
+app.include_router(sweep_router, prefix="/simulation", tags=["Braking Sweep"])
+app.include_router(network_router, prefix="/simulation", tags=["Network Simulation"])
+app.include_router(metrics_router, tags=["Metrics"])
+app.include_router(profiling_router, tags=["Profiling"])
+app.include_router(readiness_router, tags=["Readiness"])
+app.include_router(admission_router, tags=["Admission"])
+app.include_router(progress_router, tags=["Job Progress"])
@@ -0,0 +1,262 @@
+"""
+In-process metrics in the Prometheus text format, plus per-job stage timers.
+
+Pipelines time their stages with a StageTimer:
+
+    timer = StageTimer("object")
+    with timer.stage("predict"):
+        results = model.predict(...)
+    timer.count("frames")
+    ...
+    return {..., "timings": timer.finish()}
+
+Every stage call is observed into the suraksha_stage_seconds histogram as it
+happens; finish() records the job itself and returns the per-job breakdown
+that the API sends back with the results. GET /metrics renders the registry.
+"""
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+# ---------------- CONFIG ----------------
+# seconds; covers a single resize (~1 ms) up to a long video job (~15 min)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+router = APIRouter()
+
+
+def _label_str(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra) if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+                    for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _fmt(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_label_str(self.labelnames, key)} {_fmt(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn, **labels):
+        """Read the value from fn() at scrape time (e.g. a queue's current depth)."""
+        self._functions[self._key(labels)] = fn
+
+    def render(self):
+        for key, fn in list(self._functions.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue
+            with self._lock:
+                self._values[key] = value
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, count=1, **labels):
+        """Record `count` observations of `value` (count > 1 records an aggregate by its mean)."""
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += count
+            state[1] += value * count
+            state[2] += count
+
+    def _samples(self, key, value):
+        counts, total, n = value
+        out = []
+        cumulative = 0
+        for bound, c in zip(self.buckets + (float("inf"),), counts):
+            cumulative += c
+            out.append(f"{self.name}_bucket{_label_str(self.labelnames, key, [('le', _fmt(bound))])} {cumulative}")
+        out.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {_fmt(total)}")
+        out.append(f"{self.name}_count{_label_str(self.labelnames, key)} {n}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("suraksha_stage_seconds", "Duration of one pipeline stage call.",
+                                   ("pipeline", "stage"))
+JOB_SECONDS = REGISTRY.histogram("suraksha_job_seconds", "Wall time of a whole job.", ("pipeline",))
+JOBS = REGISTRY.counter("suraksha_jobs_total", "Jobs finished, by outcome.", ("pipeline", "status"))
+JOBS_IN_PROGRESS = REGISTRY.gauge("suraksha_jobs_in_progress", "Jobs currently running.", ("pipeline",))
+ITEMS = REGISTRY.counter("suraksha_items_total", "Frames, images and detections processed.",
+                         ("pipeline", "item"))
+QUEUE_DEPTH = REGISTRY.gauge("suraksha_queue_depth", "Jobs queued or running, per queue.", ("queue",))
+MODEL_WORKERS = REGISTRY.gauge("suraksha_model_workers", "Model calls currently executing, per model.", ("model",))
+
+
+@contextmanager
+def model_call(model_name):
+    """Mark a model call as in flight for the suraksha_model_workers gauge."""
+    MODEL_WORKERS.inc(model=model_name)
+    try:
+        yield
+    finally:
+        MODEL_WORKERS.dec(model=model_name)
+
+
+class StageTimer:
+    """Per-job stage timings and item counts; safe to use from several threads of one job."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.stages = {}   # stage -> [seconds, calls]
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._finished = None
+        JOBS_IN_PROGRESS.inc(pipeline=pipeline)
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def add(self, name, seconds, calls=1):
+        """Add time spent in a stage; with calls > 1 it is a total over that many calls."""
+        if calls:
+            STAGE_SECONDS.observe(seconds / calls, count=calls, pipeline=self.pipeline, stage=name)
+        with self._lock:
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += calls
+
+    def count(self, item, n=1):
+        if not n:
+            return
+        ITEMS.inc(n, pipeline=self.pipeline, item=item)
+        with self._lock:
+            self.counts[item] = self.counts.get(item, 0) + n
+
+    def summary(self):
+        total = (self._finished or time.perf_counter()) - self._start
+        with self._lock:
+            stages = {name: {"total_ms": round(s * 1000, 2), "calls": n, "mean_ms": round(s * 1000 / n, 3) if n else None}
+                      for name, (s, n) in sorted(self.stages.items(), key=lambda kv: -kv[1][0])}
+            counts = dict(self.counts)
+        return {"pipeline": self.pipeline, "total_ms": round(total * 1000, 2), "stages": stages, "counts": counts}
+
+    def finish(self, status="ok"):
+        """Record the job in the registry (once) and return its timing breakdown."""
+        if self._finished is None:
+            self._finished = time.perf_counter()
+            JOB_SECONDS.observe(self._finished - self._start, pipeline=self.pipeline)
+            JOBS.inc(pipeline=self.pipeline, status=status)
+            JOBS_IN_PROGRESS.dec(pipeline=self.pipeline)
+        return self.summary()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
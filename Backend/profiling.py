@@ -0,0 +1,243 @@
+"""
+Opt-in profiling of single jobs.
+
+Endpoints take profile=true (and profile_mode) and run just that job under a
+profiler; every other request runs exactly as before:
+
+    prof = new_profile("object", profile_mode) if profile else None
+    results = await run_in_threadpool(run_profiled, prof, run_inference, ...)
+    return {..., "profile": prof.info() if prof else None}
+
+Modes:
+    sample    samples the job's thread every SAMPLE_INTERVAL_S and writes
+              stacks.txt in the collapsed format flamegraph.pl and speedscope read
+    cprofile  deterministic cProfile; writes profile.pstats (snakeviz, pstats)
+              and cprofile.txt, the top functions by cumulative time
+    torch     torch.profiler only (needs torch), so the model calls show up per
+              operator in torch_ops.txt; its overhead stays out of the other modes
+
+Artifacts go to PROFILE_DIR/<id>/ and are served by GET /profiles/<id>/<file>.
+"""
+import io
+import re
+import sys
+import json
+import time
+import uuid
+import pstats
+import shutil
+import cProfile
+import threading
+import importlib.util
+from pathlib import Path
+from collections import Counter
+
+from fastapi import APIRouter, HTTPException, Request
+
+from artifacts import serve_artifact
+
+# ---------------- CONFIG ----------------
+PROFILE_DIR = Path(__file__).parent.resolve() / "outputs" / "profiles"
+PROFILE_MODES = ("sample", "cprofile", "torch")
+SAMPLE_INTERVAL_S = 0.005
+MAX_PROFILES = 20        # older profile directories are deleted
+MAX_STACK_DEPTH = 128
+TOP_FUNCTIONS = 60       # rows in cprofile.txt
+TOP_TORCH_OPS = 40       # rows in torch_ops.txt
+
+ARTIFACTS = {
+    "stacks.txt": "text/plain; charset=utf-8",
+    "cprofile.txt": "text/plain; charset=utf-8",
+    "profile.pstats": "application/octet-stream",
+    "torch_ops.txt": "text/plain; charset=utf-8",
+}
+META_FILE = "profile.json"
+ID_RE = re.compile(r"^[\w-][\w.-]*$")  # no leading dot, so never ".."
+
+router = APIRouter()
+
+_labels = {}
+
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        label = f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})".replace(";", ":")
+        _labels[code] = label
+    return label
+
+
+def _collapse(frame, root=None):
+    """Collapsed stack of `frame`, outermost first, starting at `root` when it is on the stack."""
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        stack.append(_label(frame.f_code))
+        if frame is root:
+            break
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class _Sampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval; native calls show as their Python caller."""
+
+    def __init__(self, thread_id, root=None, interval=SAMPLE_INTERVAL_S):
+        super().__init__(name="suraksha-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.root = root  # frame that started profiling; threadpool frames above it are left out
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame, self.root)] += 1
+                self.samples += 1
+            del frame
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+        self.root = None
+
+
+def _torch_profiler():
+    if importlib.util.find_spec("torch") is None:
+        return None
+    import torch  # type: ignore
+    from torch.profiler import profile, ProfilerActivity  # type: ignore
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+    return profile(activities=activities)
+
+
+class JobProfile:
+    """
+    Context manager that profiles the code run inside it on the current thread
+    and writes the artifacts to its directory on exit (also when the job fails).
+    Picklable through spec()/from_spec() so the simulation worker can profile
+    the job it runs.
+    """
+
+    def __init__(self, job, mode="sample", profile_id=None, root=PROFILE_DIR):
+        self.job = job
+        self.mode = mode
+        self.id = profile_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{job}-{uuid.uuid4().hex[:6]}"
+        self.dir = Path(root) / self.id
+        self._sampler = None
+        self._cprofile = None
+        self._torch = None
+
+    def spec(self):
+        return {"job": self.job, "mode": self.mode, "profile_id": self.id, "root": str(self.dir.parent)}
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(**spec)
+
+    def __enter__(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        if self.mode == "torch":
+            self._torch = _torch_profiler()
+            if self._torch is not None:
+                self._torch.__enter__()
+        elif self.mode == "cprofile":
+            self._cprofile = cProfile.Profile()
+        else:
+            self._sampler = _Sampler(threading.get_ident(), root=sys._getframe(1))
+            self._sampler.start()
+        self._t0 = time.perf_counter()
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        wall = time.perf_counter() - self._t0
+        if self._sampler is not None:
+            self._sampler.stop()
+        if self._torch is not None:
+            self._torch.__exit__(None, None, None)
+
+        meta = {"id": self.id, "job": self.job, "mode": self.mode, "wall_ms": round(wall * 1000, 2),
+                "failed": exc_type is not None}
+        if self._sampler is not None:
+            lines = (f"{stack} {n}" for stack, n in self._sampler.stacks.most_common())
+            (self.dir / "stacks.txt").write_text("\n".join(lines) + "\n")
+            meta["samples"] = self._sampler.samples
+            meta["interval_ms"] = self._sampler.interval * 1000
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(str(self.dir / "profile.pstats"))
+            out = io.StringIO()
+            pstats.Stats(self._cprofile, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            (self.dir / "cprofile.txt").write_text(out.getvalue())
+        if self._torch is not None:
+            table = self._torch.key_averages().table(sort_by="self_cpu_time_total", row_limit=TOP_TORCH_OPS)
+            (self.dir / "torch_ops.txt").write_text(table)
+        (self.dir / META_FILE).write_text(json.dumps(meta))
+        return False
+
+    def info(self):
+        """Summary and download URLs of the written artifacts (None before the profile has run)."""
+        try:
+            meta = json.loads((self.dir / META_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+        meta["artifacts"] = {name: f"/profiles/{self.id}/{name}" for name in ARTIFACTS if (self.dir / name).exists()}
+        return meta
+
+
+def _prune(root=PROFILE_DIR, keep=MAX_PROFILES):
+    if not root.exists():
+        return
+    dirs = sorted((p for p in root.iterdir() if p.is_dir()), key=lambda p: p.stat().st_mtime)
+    for p in dirs[:max(0, len(dirs) - keep)]:
+        shutil.rmtree(p, ignore_errors=True)
+
+
+def new_profile(job, mode="sample"):
+    """A JobProfile for one request; 422 for an unknown mode."""
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=422, detail=f"profile_mode must be one of {PROFILE_MODES}")
+    if mode == "torch" and importlib.util.find_spec("torch") is None:
+        raise HTTPException(status_code=422, detail="profile_mode=torch needs torch installed")
+    _prune(keep=MAX_PROFILES - 1)
+    profile = JobProfile(job, mode)
+    profile.dir.mkdir(parents=True, exist_ok=True)
+    return profile
+
+
+def run_profiled(profile, fn, *args, **kwargs):
+    """fn(*args, **kwargs), under `profile` when one is given."""
+    if profile is None:
+        return fn(*args, **kwargs)
+    with profile:
+        return fn(*args, **kwargs)
+
+
+def _profile_dir(profile_id):
+    path = (PROFILE_DIR / profile_id).resolve()
+    if not ID_RE.match(profile_id) or path.parent != PROFILE_DIR:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return path
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    info = JobProfile("", profile_id=profile_id, root=_profile_dir(profile_id).parent).info()
+    if info is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return info
+
+
+@router.get("/profiles/{profile_id}/{name}")
+async def download_profile_artifact(request: Request, profile_id: str, name: str):
+    if name not in ARTIFACTS:
+        raise HTTPException(status_code=404, detail="Profile artifact not found")
+    return await serve_artifact(request, _profile_dir(profile_id) / name, ARTIFACTS[name], filename=name,
+                                compressible=name.endswith(".txt"), not_found="Profile artifact not found")
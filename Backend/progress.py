@@ -0,0 +1,241 @@
+"""
+Live progress of analyze jobs over server-sent events.
+
+The client picks a job_id, opens GET /jobs/<job_id>/events (an EventSource) and
+posts the upload with the same job_id. The stream carries:
+
+    queued    the job is waiting for admission
+    started   admitted; includes the admission info
+    progress  frames_done / frames_total, fps, eta_s (at most every PROGRESS_INTERVAL_S)
+    alert     a newly found hazard, as soon as the frame loop sees it
+    stage     post-processing step (outputs, ffmpeg, zip)
+    done      final summary and artifact URLs
+    failed    the job failed; detail says why (not "error", which EventSource
+              reserves for connection errors)
+
+Events are kept per job (last MAX_EVENTS), so a client that connects late or
+reconnects with Last-Event-ID gets what it missed. The frame loops publish
+from worker threads; subscribers are woken on the event loop.
+"""
+import re
+import json
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict, deque
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+# ---------------- CONFIG ----------------
+PROGRESS_INTERVAL_S = 0.5
+KEEPALIVE_S = 15.0
+MAX_EVENTS = 1000       # per job
+MAX_JOBS = 200          # finished jobs beyond this are forgotten, oldest first
+PENDING_TTL_S = 600     # a job_id someone subscribed to but never posted
+MAX_PENDING_JOBS = 100  # such job_ids at once; further subscriptions to unknown jobs get 429
+JOB_ID_RE = re.compile(r"^[\w-]{1,64}$")
+
+router = APIRouter()
+
+
+class JobProgress:
+    """Progress events of one job. publish() is thread-safe; stream() runs on the event loop."""
+
+    def __init__(self, job_id, kind=None):
+        self.job_id = job_id
+        self.kind = kind
+        self.status = "pending"
+        self.created = time.time()
+        self.closed = False
+        self.alerts = 0
+        self.last_progress = None
+        self._events = deque(maxlen=MAX_EVENTS)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._subscribers = set()   # (loop, asyncio.Event)
+        self._t0 = None
+        self._last_emit = 0.0
+
+    # ---- publishing (any thread) ----
+    def publish(self, event, data):
+        with self._lock:
+            if self.closed:
+                return
+            self._seq += 1
+            self._events.append((self._seq, event, data))
+            if event in ("done", "failed"):
+                self.closed = True
+            subscribers = list(self._subscribers)
+        for loop, wake in subscribers:
+            loop.call_soon_threadsafe(wake.set)
+
+    def queued(self, kind):
+        self.kind = kind
+        self.status = "queued"
+        self.publish("queued", {"job_id": self.job_id, "kind": kind})
+
+    def started(self, admission=None):
+        self.status = "running"
+        self._t0 = time.perf_counter()
+        self.publish("started", {"admission": admission})
+
+    def frame(self, done, total=None, force=False):
+        """Frame loop hook: `done` of `total` frames (total None when unknown); throttled."""
+        now = time.perf_counter()
+        if not force and now - self._last_emit < PROGRESS_INTERVAL_S:
+            return
+        self._last_emit = now
+        elapsed = now - (self._t0 or now)
+        fps = done / elapsed if elapsed > 0 else None
+        eta = (total - done) / fps if fps and total else None
+        self.last_progress = {
+            "frames_done": done, "frames_total": total,
+            "percent": round(100.0 * done / total, 1) if total else None,
+            "fps": round(fps, 1) if fps else None,
+            "eta_s": round(max(0.0, eta), 1) if eta is not None else None,
+            "elapsed_s": round(elapsed, 2),
+        }
+        self.publish("progress", self.last_progress)
+
+    def alert(self, row):
+        self.alerts += 1
+        self.publish("alert", row)
+
+    def stage(self, name):
+        self.publish("stage", {"stage": name})
+
+    def finish(self, summary):
+        self.status = "done"
+        self.publish("done", summary)
+
+    def fail(self, detail):
+        self.status = "failed"
+        self.publish("failed", {"detail": detail})
+
+    def snapshot(self):
+        return {"job_id": self.job_id, "kind": self.kind, "status": self.status, "alerts": self.alerts,
+                "progress": self.last_progress}
+
+    # ---- as a context manager around an endpoint ----
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.fail(getattr(exc, "detail", None) or str(exc) or exc_type.__name__)
+        elif not self.closed:
+            self.finish({})
+        return False
+
+    # ---- consuming (event loop) ----
+    def since(self, last_id):
+        with self._lock:
+            return [e for e in self._events if e[0] > last_id]
+
+    async def stream(self, request, last_id=0):
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        sub = (loop, wake)
+        with self._lock:
+            self._subscribers.add(sub)
+        try:
+            while True:
+                wake.clear()
+                for seq, event, data in self.since(last_id):
+                    last_id = seq
+                    yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+                if self.closed and not self.since(last_id):
+                    return
+                try:
+                    await asyncio.wait_for(wake.wait(), KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                if await request.is_disconnected():
+                    return
+        finally:
+            with self._lock:
+                self._subscribers.discard(sub)
+
+
+class ProgressHub:
+    def __init__(self):
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.status == "pending" and now - job.created > PENDING_TTL_S:
+                del self._jobs[job_id]
+        excess = len(self._jobs) - MAX_JOBS
+        for job_id, job in list(self._jobs.items()):
+            if excess <= 0:
+                break
+            if job.closed:
+                del self._jobs[job_id]
+                excess -= 1
+
+    def get(self, job_id, create=False):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None and create:
+                self._prune()
+                pending = sum(1 for j in self._jobs.values() if j.status == "pending")
+                if pending >= MAX_PENDING_JOBS:
+                    raise HTTPException(status_code=429, headers={"Retry-After": str(PENDING_TTL_S)},
+                                        detail="Too many subscriptions to jobs that have not been posted")
+                job = self._jobs[job_id] = JobProgress(job_id)
+            return job
+
+    def open(self, job_id, kind):
+        """Progress for a new job; reuses a job_id a client already subscribed to, 409 if it is in use."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in ("queued", "running"):
+                raise HTTPException(status_code=409, detail=f"Job {job_id} is already running")
+            if job is None or job.closed:
+                self._prune()
+                job = self._jobs[job_id] = JobProgress(job_id)
+            self._jobs.move_to_end(job_id)
+        job.queued(kind)
+        return job
+
+
+HUB = ProgressHub()
+
+
+def _check_id(job_id):
+    if not JOB_ID_RE.match(job_id):
+        raise HTTPException(status_code=422, detail="job_id must be 1-64 letters, digits, '_' or '-'")
+
+
+def open_job(job_id, kind) -> JobProgress:
+    """Progress channel for an analyze request; a job_id is generated when the client sent none."""
+    job_id = job_id or uuid.uuid4().hex
+    _check_id(job_id)
+    return HUB.open(job_id, kind)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(request: Request, job_id: str):
+    """SSE stream of a job's progress; may be opened before the job is posted."""
+    _check_id(job_id)
+    job = HUB.get(job_id, create=True)
+    try:
+        last_id = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        last_id = 0
+    return StreamingResponse(job.stream(request, last_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Latest progress of a job, for clients that poll instead of streaming."""
+    _check_id(job_id)
+    job = HUB.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
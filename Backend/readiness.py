@@ -0,0 +1,115 @@
+"""
+Readiness and optional warmup.
+
+The API imports no model weights, Panda3D, pandas or folium at startup; each is
+loaded on first use. SURAKSHA_WARMUP lists components to load ahead of traffic
+(comma-separated, or "all"):
+
+    object      load the object model and run one dummy batch
+    track       load the track fault model and run one dummy image
+    simulation  start the simulation worker and wait for its engine
+
+Warmup runs in the background after startup. GET /ready answers 503 until it
+has finished (and 200 after), so a load balancer or readiness probe only sends
+traffic to a warm worker; the body says which components are loaded.
+"""
+import os
+import time
+import threading
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+import inference_object
+import inference_track
+import sim_service
+
+# ---------------- CONFIG ----------------
+WARMUP_COMPONENTS = ("object", "track", "simulation")
+WARMUP_DEVICE = os.environ.get("SURAKSHA_WARMUP_DEVICE", "cpu")
+SIM_READY_TIMEOUT_S = 120
+
+router = APIRouter()
+
+
+def _warmup_simulation():
+    service = sim_service.get_service()
+    if not service.ready.wait(SIM_READY_TIMEOUT_S):
+        raise RuntimeError(f"Simulation worker not ready after {SIM_READY_TIMEOUT_S}s")
+
+
+WARMUPS = {
+    "object": lambda: inference_object.warmup(WARMUP_DEVICE),
+    "track": lambda: inference_track.warmup(WARMUP_DEVICE),
+    "simulation": _warmup_simulation,
+}
+
+
+def requested_components(value=None):
+    """Components named by SURAKSHA_WARMUP (unknown names are ignored)."""
+    value = os.environ.get("SURAKSHA_WARMUP", "") if value is None else value
+    names = [n.strip().lower() for n in value.split(",") if n.strip()]
+    if "all" in names:
+        return list(WARMUP_COMPONENTS)
+    return [n for n in WARMUP_COMPONENTS if n in names]
+
+
+class Warmup:
+    """Runs the requested warmups one after another on a background thread."""
+
+    def __init__(self, components):
+        self.components = list(components)
+        self.done = {}     # component -> seconds taken
+        self.errors = {}   # component -> error message
+        self.finished = threading.Event()
+        if not self.components:
+            self.finished.set()
+
+    def start(self):
+        if self.components:
+            threading.Thread(target=self._run, name="suraksha-warmup", daemon=True).start()
+        return self
+
+    def _run(self):
+        try:
+            for name in self.components:
+                t0 = time.perf_counter()
+                try:
+                    WARMUPS[name]()
+                    self.done[name] = round(time.perf_counter() - t0, 3)
+                except Exception as e:
+                    self.errors[name] = f"{type(e).__name__}: {e}"
+        finally:
+            self.finished.set()
+
+    def state(self):
+        return {"requested": self.components, "finished": self.finished.is_set(), "seconds": dict(self.done),
+                "errors": dict(self.errors)}
+
+
+_warmup = Warmup([])
+
+
+def start_warmup(components=None):
+    global _warmup
+    _warmup = Warmup(requested_components() if components is None else components).start()
+    return _warmup
+
+
+def components():
+    """Which components are loaded right now."""
+    service = sim_service.current_service()
+    return {
+        "object_model": inference_object.model_loaded(),
+        "track_model": inference_track.model_loaded(),
+        "simulation_worker": service is not None and service.alive and service.ready.is_set(),
+    }
+
+
+@router.get("/ready")
+async def ready():
+    """200 once the requested warmup has finished without errors, 503 before (or after a failed warmup)."""
+    warmup = _warmup.state()
+    is_ready = warmup["finished"] and not warmup["errors"]
+    return JSONResponse(status_code=200 if is_ready else 503,
+                        content={"ready": is_ready, "components": components(), "warmup": warmup})
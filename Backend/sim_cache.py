@@ -0,0 +1,200 @@
+import os
+import json
+import asyncio
+import hashlib
+from pathlib import Path
+from collections import Counter, OrderedDict
+
+from fastapi import HTTPException
+from starlette.responses import Response
+
+from artifacts import serve_artifact
+from sim_runtime import CAPTURE_PRESETS, capture_settings
+from sim_service import get_service
+
+# ---------------- CONFIG ----------------
+CACHE_DIR = Path(__file__).parent.resolve() / "output" / "simulations"
+MAX_ENTRIES = int(os.environ.get("SURAKSHA_SIM_CACHE_ENTRIES", "64"))
+# bump when scenario code changes in a way that alters the rendered video
+CACHE_VERSION = 2
+
+
+def scenario_key(kind: str, params: dict, capture: dict = None) -> str:
+    """Stable key for a scenario: same kind, parameters and capture settings -> same key, whatever the dict order."""
+    canonical = json.dumps({"v": CACHE_VERSION, "kind": kind, "params": params, "capture": capture or {}},
+                           sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+class SimulationCache:
+    """
+    LRU cache of rendered simulation videos, one file per canonical scenario.
+
+    Entries are files in CACHE_DIR named <kind>-<key>.mp4, each with a <kind>-<key>.json
+    holding the run summary; recency is tracked in memory (seeded from file mtimes on
+    startup) and the oldest files are deleted once there are more than max_entries.
+    Concurrent requests for the same scenario share one render. get_or_render()
+    holds the entry it returns until release(); an entry evicted while held
+    keeps its files until the last holder releases it.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_entries=MAX_ENTRIES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lru = OrderedDict()
+        for p in sorted(self.root.glob("*.mp4"), key=lambda p: p.stat().st_mtime):
+            if not p.name.endswith(".part.mp4"):
+                self._lru[p.stem] = p
+        self._inflight = {}
+        self._holders = Counter()
+        self._evicted = {}  # name -> path of evicted entries still being served
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, kind, key):
+        return self.root / f"{kind}-{key}.mp4"
+
+    def run_info(self, path):
+        """Summary of the run that rendered `path` (frames, timings, log), if recorded."""
+        try:
+            return json.loads(Path(path).with_suffix(".json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _touch(self, name, path):
+        self._lru[name] = path
+        self._lru.move_to_end(name)
+        self._evicted.pop(name, None)
+
+    @staticmethod
+    def _delete(path):
+        path.unlink(missing_ok=True)
+        path.with_suffix(".json").unlink(missing_ok=True)
+
+    def _evict(self):
+        while len(self._lru) > self.max_entries:
+            name, path = self._lru.popitem(last=False)
+            if self._holders[name]:
+                self._evicted[name] = path  # deleted by release() once its downloads are done
+            else:
+                self._delete(path)
+
+    def _hold(self, name):
+        self._holders[name] += 1
+
+    def release(self, path):
+        """Drop one hold taken by get_or_render() on the entry at `path`."""
+        name = Path(path).stem
+        self._holders[name] -= 1
+        if self._holders[name] <= 0:
+            del self._holders[name]
+            evicted = self._evicted.pop(name, None)
+            if evicted is not None:
+                self._delete(evicted)
+
+    async def get_or_render(self, kind: str, params: dict, capture: dict = None, profile=None):
+        """Return (path, key, hit) for the scenario, rendering it on the simulation worker on a miss.
+        A cached path is held until the caller passes it to release().
+        With a JobProfile the scenario is always rendered, under the profiler, into the profile's directory."""
+        key = scenario_key(kind, params, capture)
+        path = self.path_for(kind, key)
+        name = path.stem
+        if profile is not None:
+            path = profile.dir / path.name
+            result = await get_service().run(kind, params, video_path=str(path), capture=capture,
+                                             profile=profile.spec())
+            path.with_suffix(".json").write_text(json.dumps(result))
+            return path, key, False
+        # files only appear once fully encoded (see FrameRecorder), so existing means complete
+        if path.exists():
+            self.hits += 1
+            self._touch(name, path)
+            self._hold(name)
+            return path, key, True
+
+        inflight = self._inflight.get(name)
+        if inflight is not None:
+            await asyncio.shield(inflight)
+            if not path.exists():  # evicted before this request got to it
+                return await self.get_or_render(kind, params, capture)
+            self.hits += 1
+            self._hold(name)
+            return path, key, True
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[name] = fut
+        try:
+            result = await get_service().run(kind, params, video_path=str(path), capture=capture)
+            if not result.get("video"):
+                raise RuntimeError("Simulation finished without producing a video")
+            path.with_suffix(".json").write_text(json.dumps(result))
+            self._touch(name, path)
+            self._hold(name)
+            self._evict()
+            fut.set_result(path)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                fut.cancel()
+            else:
+                fut.set_exception(e)
+                fut.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(name, None)
+        return path, key, False
+
+
+class _HeldResponse(Response):
+    """Sends `response`, then releases the cache entry it serves, also when the client disconnects."""
+
+    def __init__(self, response, release):
+        self.response = response
+        self.status_code = response.status_code
+        self.raw_headers = response.raw_headers  # shared, so headers set on this response are sent
+        self.background = response.background
+        self._release = release
+
+    async def __call__(self, scope, receive, send):
+        self.response.background = self.background
+        try:
+            await self.response(scope, receive, send)
+        finally:
+            self._release()
+
+
+_cache = None
+
+
+def get_cache() -> SimulationCache:
+    global _cache
+    if _cache is None:
+        _cache = SimulationCache()
+    return _cache
+
+
+async def serve_scenario(request, kind, params, quality, filename="simulation.mp4", profile=None):
+    """Render (or fetch from cache) a scenario at a capture preset and serve the video.
+    A profiled request bypasses the cache; X-Profile points at its artifacts."""
+    if quality not in CAPTURE_PRESETS:
+        raise HTTPException(status_code=422, detail=f"quality must be one of {tuple(CAPTURE_PRESETS)}")
+    cache = get_cache()
+    path, key, hit = await cache.get_or_render(kind, params, capture_settings(quality), profile=profile)
+    if profile is None:
+        try:
+            response = await serve_artifact(request, path, "video/mp4", filename=filename)
+        except BaseException:
+            cache.release(path)
+            raise
+        response = _HeldResponse(response, lambda: cache.release(path))
+    else:
+        response = await serve_artifact(request, path, "video/mp4", filename=filename)
+    response.headers["X-Scenario-Key"] = key
+    response.headers["X-Cache"] = "BYPASS" if profile is not None else "HIT" if hit else "MISS"
+    if profile is not None:
+        response.headers["X-Profile"] = f"/profiles/{profile.id}"
+    info = cache.run_info(path)
+    if info and info.get("capture", {}).get("ms_per_frame") is not None:
+        response.headers["X-Capture-Ms-Per-Frame"] = str(info["capture"]["ms_per_frame"])
+    return response
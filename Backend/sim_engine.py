@@ -0,0 +1,205 @@
+import time
+import signal
+
+import numpy as np
+from panda3d.core import (
+    loadPrcFileData, AmbientLight, DirectionalLight, Vec4, LineSegs,
+    CardMaker, NodePath, TextNode, Texture
+)
+from direct.showbase.ShowBase import ShowBase
+from direct.gui.OnscreenText import OnscreenText
+
+from sim_recorder import FrameRecorder, RECORD_FPS
+from sim_runtime import SIM_DT, SIM_FPS, MAX_SIM_SECONDS, use_fixed_clock
+
+# === Panda3D offscreen settings ===
+loadPrcFileData("", "window-type offscreen")
+loadPrcFileData("", "audio-library-name null")
+# host window for the capture buffers (never rendered itself); sized for the largest preset
+loadPrcFileData("", "win-size 1280 720")
+
+
+class SimulationEngine(ShowBase):
+    """
+    One long-lived Panda3D instance shared by every simulation run.
+
+    The offscreen window, camera, lights, track and log overlay are built once.
+    Each run gets a fresh `scene` node for its trains and markers, which is
+    removed again by reset(), so back-to-back runs start from the same state.
+
+    Frames are rendered into an offscreen buffer per capture size whose texture
+    is copied to RAM by Panda3D, and read straight from that RAM image into the
+    recorder's frame pool. Panda3D's native layout (bottom-up BGRA) is passed
+    through as-is; the encoder flips and converts it.
+    """
+
+    def __init__(self):
+        # avoid Panda3D trying to install signal handlers; only ever done inside the
+        # dedicated simulation worker process (see sim_service)
+        signal.signal = lambda *a, **k: None
+        ShowBase.__init__(self)
+
+        # === visual overlay (OnscreenText) - will be included in offscreen renders
+        self.log_lines = []
+        self.log_history = []
+        self.log_label = OnscreenText(
+            text="", pos=(-1.3, 0.9), scale=0.05,
+            fg=(1, 1, 1, 1), align=TextNode.ALeft, mayChange=True
+        )
+
+        # camera
+        self.disableMouse()
+        self.camera.setPos(0, -250, 120)
+        self.camera.lookAt(0, 0, 0)
+
+        # lights and track
+        self._setup_lights()
+        self._create_track()
+
+        self.scene = None
+        self.runs = 0
+        self._targets = {}  # (width, height) -> (buffer, texture)
+        # nothing renders to the main window; recordings use the capture buffers
+        self.win.setActive(False)
+
+    def _setup_lights(self):
+        dlight = DirectionalLight("dlight")
+        dlight.setColor(Vec4(0.9, 0.9, 0.9, 1))
+        dlnp = self.render.attachNewNode(dlight)
+        dlnp.setHpr(45, -60, 0)
+        self.render.setLight(dlnp)
+
+        alight = AmbientLight("alight")
+        alight.setColor(Vec4(0.4, 0.4, 0.45, 1))
+        self.render.setLight(self.render.attachNewNode(alight))
+
+    def _create_track(self):
+        ls = LineSegs()
+        ls.setThickness(4.0)
+        ls.setColor(0.8, 0.8, 0.8, 1)
+        ls.moveTo(-4, -250, -6.5); ls.drawTo(-4, 250, -6.5)
+        ls.moveTo(4, -250, -6.5); ls.drawTo(4, 250, -6.5)
+        self.track = self.render.attachNewNode(ls.create())
+
+    def log(self, msg):
+        """Add a message to the overlay and print it (console)."""
+        print(msg)
+        self.log_history.append(msg)
+        self.log_lines.append(msg)
+        if len(self.log_lines) > 12:
+            self.log_lines.pop(0)
+        self.log_label.setText("\n".join(self.log_lines))
+
+    def spawn_train(self, name, color, pos):
+        train = NodePath(name)
+        size = 6
+        cm = CardMaker("side")
+        cm.setFrame(-size, size, -size/2, size/2)
+        for h in [0, 90, 180, 270]:
+            card = train.attachNewNode(cm.generate())
+            card.setHpr(h, 0, 0)
+            card.setColor(color)
+        tb = CardMaker("tb"); tb.setFrame(-size, size, -size, size)
+        top = train.attachNewNode(tb.generate()); top.setHpr(0,90,0); top.setZ(size/2); top.setColor(color)
+        bot = train.attachNewNode(tb.generate()); bot.setHpr(0,-90,0); bot.setZ(-size/2); bot.setColor(color)
+        train.reparentTo(self.scene)
+        train.setPos(pos)
+        return train
+
+    def reset(self):
+        """Drop everything the previous run added and clear the overlay."""
+        if self.scene is not None:
+            self.scene.removeNode()
+        self.scene = self.render.attachNewNode("scene")
+        self.track.show()
+        self.log_lines = []
+        self.log_history = []
+        self.log_label.setText("")
+
+    def _capture_target(self, width, height):
+        """Offscreen buffer of the given size rendering the main camera and overlay into a RAM-copied texture."""
+        target = self._targets.get((width, height))
+        if target is None:
+            tex = Texture(f"capture-{width}x{height}")
+            buf = self.win.makeTextureBuffer(f"capture-{width}x{height}", width, height, tex, True)
+            buf.setClearColor(self.win.getClearColor())
+            buf.makeDisplayRegion().setCamera(self.cam)
+            overlay = buf.makeDisplayRegion()
+            overlay.setSort(20)
+            overlay.setCamera(self.cam2d)
+            target = self._targets[(width, height)] = (buf, tex)
+        for buf, _ in self._targets.values():
+            buf.setActive(buf is target[0])
+        self.camLens.setAspectRatio(width / height)
+        return target
+
+    def run(self, scenario, video_path=None, width=1280, height=720, fps=RECORD_FPS):
+        """
+        Run one scenario to completion on the fixed timestep. When video_path is
+        given, every SIM_FPS/fps-th tick is rendered at width x height and
+        recorded; other ticks are never rendered. A scenario that ends before
+        its first recorded tick still gets its final state as a one-frame video.
+        Returns a summary dict.
+        """
+        self.reset()
+        use_fixed_clock()
+        scenario.setup(self)
+        self.runs += 1
+
+        stride = max(1, round(SIM_FPS / fps))
+        buf = tex = recorder = None
+        if video_path:
+            buf, tex = self._capture_target(width, height)
+        render_s = copy_s = 0.0
+        steps = 0
+        max_steps = int(MAX_SIM_SECONDS * SIM_FPS)
+        start_t = time.perf_counter()
+
+        def capture():
+            nonlocal recorder, render_s, copy_s
+            t0 = time.perf_counter()
+            self.taskMgr.step()  # renders the frame into the capture texture
+            t1 = time.perf_counter()
+            if recorder is None:
+                channels = tex.getNumComponents()
+                recorder = FrameRecorder(video_path, tex.getXSize(), tex.getYSize(), SIM_FPS / stride,
+                                         pix_fmt="bgra" if channels == 4 else "bgr24", flip=True)
+            frame = recorder.acquire()
+            np.copyto(frame, np.frombuffer(tex.getRamImage(), dtype=np.uint8).reshape(frame.shape))
+            recorder.write(frame)
+            render_s += t1 - t0
+            copy_s += time.perf_counter() - t1
+
+        try:
+            while not scenario.finished and steps < max_steps:
+                scenario.update(SIM_DT)
+                steps += 1
+                if scenario.finished:
+                    break
+                if tex is not None and not (steps - 1) % stride:
+                    capture()
+            if tex is not None and recorder is None:
+                capture()
+        finally:
+            if buf is not None:
+                buf.setActive(False)
+            if recorder is not None:
+                recorder.close()
+                self.log(f"🎥 Video saved ({recorder.encoder}) to {video_path}")
+
+        frames = recorder.frames_written if recorder is not None else 0
+        return {
+            "video": video_path if recorder is not None else None,
+            "finished": scenario.finished,
+            "steps": steps,
+            "frames": frames,
+            "sim_time_s": round(steps * SIM_DT, 3),
+            "wall_s": round(time.perf_counter() - start_t, 3),
+            "capture": {
+                "width": width, "height": height, "fps": round(SIM_FPS / stride, 3),
+                "render_ms_per_frame": round(1000 * render_s / frames, 3) if frames else None,
+                "copy_ms_per_frame": round(1000 * copy_s / frames, 3) if frames else None,
+                "ms_per_frame": round(1000 * (render_s + copy_s) / frames, 3) if frames else None,
+            },
+            "log": list(self.log_history),
+        }
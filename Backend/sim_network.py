@@ -0,0 +1,428 @@
+"""
+Multi-train network simulation.
+
+Generalizes the two Panda3D demos (one train braking for a track fault, two
+trains head-on) to many trains on several parallel tracks with static faults
+and obstacles. All state lives in NumPy arrays. Every tick the trains and
+hazards are sorted once by (track, position), so each train's nearest object
+ahead is simply its neighbour in that order: O(n log n) per tick instead of
+comparing every pair. Each train runs the demos' braking rule as a small state
+machine:
+
+    RUNNING -> BRAKING   object ahead closer than planned stopping distance + min_gap
+    BRAKING -> RUNNING   object ahead clear again (e.g. the leader pulled away)
+    BRAKING -> STOPPED   speed reached zero
+    STOPPED -> RUNNING   object ahead clear again
+    any     -> COLLIDED  reached or passed the object ahead
+    any     -> EXITED    left the section
+
+The core needs no Panda3D, so large networks run headless at high step rates;
+NetworkScenario renders one through the shared SimulationEngine when a video is wanted.
+
+CLI:  python sim_network.py --tracks 8 --trains 400 --faults 4 --obstacles 4
+"""
+import json
+import time
+import argparse
+from typing import Optional
+
+import numpy as np  # type: ignore
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError
+
+from braking_sweep import range_param, range_arg, check_ranges
+from metrics import StageTimer
+from profiling import new_profile, run_profiled
+from sim_cache import serve_scenario
+from sim_runtime import SIM_DT, DEFAULT_CAPTURE
+
+# ---------------- CONFIG ----------------
+RUNNING, BRAKING, STOPPED, COLLIDED, EXITED = range(5)
+STATE_NAMES = ("RUNNING", "BRAKING", "STOPPED", "COLLIDED", "EXITED")
+LAYOUTS = ("one_way", "mixed")  # one_way: even tracks run up, odd tracks down; mixed: random per train
+COLLISION_DIST = 2.0     # m; closing to within this of the object ahead counts as contact
+RESUME_MARGIN = 20.0     # m of hysteresis before a braking or stopped train sets off again
+MAX_EVENTS = 2000        # state changes kept per run; the counts are always complete
+MAX_RENDER_TRAINS = 200
+TRACK_SPACING = 20.0     # scene units between rendered tracks
+SCENE_LENGTH = 500.0     # the rendered section spans y = -250..250, like the demos
+MAX_TRAIN_SECONDS = 2_000_000  # n_trains x max_seconds per run, so one request cannot hold a worker for long
+RANGE_FIELDS = ("speed_kmph", "decel")
+
+router = APIRouter()
+
+def _draw(rng, spec, n):
+    if isinstance(spec, (list, tuple)):
+        lo, hi = spec
+        return rng.uniform(lo, hi, n)
+    return np.full(n, float(spec))
+
+
+class TrainNetwork:
+    """
+    Trains and static hazards on parallel straight tracks of equal length.
+
+    Positions are metres from the start of the section, speeds are m/s
+    magnitudes and `direction` is +1 or -1. Hazards never move.
+    """
+
+    def __init__(self, track, pos, direction, speed, decel, plan_decel=None, accel=0.5,
+                 min_gap=60.0, detection_range=300.0, length=5000.0,
+                 hazard_track=(), hazard_pos=(), hazard_kind=()):
+        n = len(pos)
+        self.n = n
+        self.length = float(length)
+        self.min_gap = float(min_gap)
+        self.detection_range = float(detection_range)
+
+        self.track = np.asarray(track, dtype=np.int64)
+        self.pos = np.array(pos, dtype=float)
+        self.dir = np.asarray(direction, dtype=float)
+        self.cruise = np.broadcast_to(np.asarray(speed, dtype=float), (n,)).copy()
+        self.vel = self.cruise.copy()
+        self.decel = np.broadcast_to(np.asarray(decel, dtype=float), (n,)).copy()
+        self.plan_decel = (self.decel.copy() if plan_decel is None
+                           else np.full(n, float(plan_decel)))
+        self.accel = np.full(n, float(accel))
+        self.state = np.full(n, RUNNING, dtype=np.int8)
+
+        self.h_track = np.asarray(hazard_track, dtype=np.int64)
+        self.h_pos = np.asarray(hazard_pos, dtype=float)
+        self.h_kind = list(hazard_kind)
+
+        self.time = 0.0
+        self.steps = 0
+        self.events = []
+        self.transitions = np.zeros(len(STATE_NAMES), dtype=np.int64)
+        self.closest = np.full(n, np.inf)  # closest approach to the object ahead, per train
+        self._scan()
+
+    # ---------- spatial index ----------
+    def _scan(self):
+        """Gap to and index of the nearest object ahead of every train (index n + j is hazard j, -1 is none)."""
+        n = self.n
+        track = np.concatenate([np.where(self.state == EXITED, -1, self.track), self.h_track])
+        pos = np.concatenate([self.pos, self.h_pos])
+        order = np.lexsort((pos, track))
+        rank = np.empty_like(order)
+        rank[order] = np.arange(order.size)
+
+        nb = np.where(self.dir > 0, rank[:n] + 1, rank[:n] - 1)
+        valid = (nb >= 0) & (nb < order.size)
+        nb = order[np.clip(nb, 0, order.size - 1)]
+        valid &= (track[nb] == self.track) & (self.state != EXITED)
+
+        self.ahead = np.where(valid, nb, -1)
+        self.gap = np.where(valid, (pos[nb] - self.pos) * self.dir, np.inf)
+        self.closest = np.minimum(self.closest, self.gap)
+
+    def _label(self, idx):
+        if idx < 0:
+            return None
+        if idx < self.n:
+            return f"train {idx}"
+        return f"{self.h_kind[idx - self.n]} {idx - self.n}"
+
+    # ---------- dynamics ----------
+    def step(self, dt=SIM_DT):
+        old = self.state
+        gap, ahead = self.gap, self.ahead
+        seen = gap <= self.detection_range
+        # an oncoming train uses up the gap too, so its planned stopping distance counts against ours
+        other = np.clip(ahead, 0, self.n - 1) if self.n else ahead
+        oncoming = (ahead >= 0) & (ahead < self.n) & (self.dir[other] != self.dir)
+        other_stop = np.where(oncoming, self.vel[other] ** 2 / (2.0 * self.plan_decel[other]), 0.0)
+        own_stop = self.vel ** 2 / (2.0 * self.plan_decel)
+        cruise_stop = self.cruise ** 2 / (2.0 * self.plan_decel)
+        danger = seen & (gap < own_stop + other_stop + self.min_gap)
+        clear = ~seen | (gap > cruise_stop + other_stop + self.min_gap + RESUME_MARGIN)
+
+        new = old.copy()
+        new[(old == RUNNING) & danger] = BRAKING
+        new[((old == BRAKING) | (old == STOPPED)) & clear] = RUNNING
+
+        braking = new == BRAKING
+        running = new == RUNNING
+        self.vel[braking] = np.maximum(0.0, self.vel[braking] - self.decel[braking] * dt)
+        self.vel[running] = np.minimum(self.cruise[running], self.vel[running] + self.accel[running] * dt)
+        new[braking & (self.vel == 0.0)] = STOPPED
+        self.pos += self.dir * self.vel * dt
+
+        # contact with the object that was ahead before this move (a pass-through shows up as a negative gap)
+        all_pos = np.concatenate([self.pos, self.h_pos])
+        has = (ahead >= 0) & (new != COLLIDED)
+        other = np.clip(ahead, 0, None)
+        new_gap = np.where(has, (all_pos[other] - self.pos) * self.dir, np.inf)
+        hit = np.nonzero(has & (new_gap < COLLISION_DIST) & (new_gap < gap))[0]
+        if hit.size:
+            # back to the contact point, so the sort order stays physical after a pass-through
+            self.pos[hit] = all_pos[other[hit]] - self.dir[hit] * 0.5
+            partners = ahead[hit]
+            partners = partners[partners < self.n]
+            for idx in (hit, partners):
+                new[idx] = COLLIDED
+                self.vel[idx] = 0.0
+
+        out = ((self.pos < 0.0) | (self.pos > self.length)) & (new != COLLIDED) & (new != EXITED)
+        new[out] = EXITED
+        self.vel[out] = 0.0
+
+        self.time += dt
+        self.steps += 1
+        self._record(old, new, gap)
+        self.state = new
+        self._scan()
+
+    def _record(self, old, new, gap):
+        changed = np.nonzero(new != old)[0]
+        if not changed.size:
+            return
+        np.add.at(self.transitions, new[changed], 1)
+        room = MAX_EVENTS - len(self.events)
+        for i in changed[:max(room, 0)]:
+            ev = {"t_s": round(self.time, 3), "train": int(i), "track": int(self.track[i]),
+                  "from": STATE_NAMES[old[i]], "to": STATE_NAMES[new[i]],
+                  "gap_m": None if np.isinf(gap[i]) else round(float(gap[i]), 2)}
+            if new[i] == COLLIDED:
+                ev["with"] = self._label(int(self.ahead[i]))
+            self.events.append(ev)
+
+    @property
+    def finished(self):
+        """Nothing is moving any more, so nothing will change."""
+        return not np.any((self.state == RUNNING) | (self.state == BRAKING))
+
+    def run(self, max_seconds=600.0, dt=SIM_DT):
+        start_t = time.perf_counter()
+        max_steps = int(max_seconds / dt)
+        while not self.finished and self.steps < max_steps:
+            self.step(dt)
+        wall = time.perf_counter() - start_t
+        return self.summary(wall)
+
+    def summary(self, wall_s=None):
+        counts = np.bincount(self.state, minlength=len(STATE_NAMES))
+        approach = self.closest[np.isfinite(self.closest)]
+        out = {
+            "trains": self.n,
+            "hazards": int(self.h_pos.size),
+            "finished": self.finished,
+            "steps": self.steps,
+            "sim_time_s": round(self.time, 3),
+            "states": {name: int(c) for name, c in zip(STATE_NAMES, counts)},
+            "collisions": int(self.transitions[COLLIDED]),
+            "brake_applications": int(self.transitions[BRAKING]),
+            "closest_approach_m": ({f"p{p}": round(float(v), 2)
+                                    for p, v in zip((0, 5, 50), np.percentile(approach, (0, 5, 50)))}
+                                   if approach.size else None),
+            "events_truncated": int(self.transitions.sum()) > len(self.events),
+        }
+        if wall_s is not None:
+            out["wall_s"] = round(wall_s, 4)
+            out["steps_per_s"] = round(self.steps / wall_s, 1) if wall_s > 0 else None
+        return out
+
+
+def generate_network(n_tracks=4, n_trains=40, n_faults=2, n_obstacles=2, length_m=5000.0,
+                     speed_kmph=(40.0, 80.0), decel=(0.8, 1.4), plan_decel=None, accel=0.5,
+                     min_gap=60.0, detection_range=300.0, layout="one_way", seed=0):
+    """Random but reproducible section: trains spread evenly per track, hazards placed uniformly."""
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout {layout!r}, expected one of {LAYOUTS}")
+    rng = np.random.default_rng(seed)
+    track = np.arange(n_trains) % n_tracks
+
+    # one slot per train on its track, jittered inside the slot so neighbours never start on top of each other
+    pos = np.empty(n_trains)
+    for t in range(n_tracks):
+        idx = np.nonzero(track == t)[0]
+        if idx.size:
+            slot = length_m / idx.size
+            pos[idx] = (np.arange(idx.size) + rng.uniform(0.1, 0.6, idx.size)) * slot
+
+    if layout == "one_way":
+        direction = np.where(track % 2 == 0, 1.0, -1.0)
+    else:
+        direction = rng.choice([-1.0, 1.0], n_trains)
+
+    n_hazards = n_faults + n_obstacles
+    return TrainNetwork(
+        track, pos, direction,
+        speed=_draw(rng, speed_kmph, n_trains) / 3.6, decel=_draw(rng, decel, n_trains),
+        plan_decel=plan_decel, accel=accel, min_gap=min_gap, detection_range=detection_range, length=length_m,
+        hazard_track=rng.integers(0, n_tracks, n_hazards),
+        hazard_pos=rng.uniform(0.1, 0.9, n_hazards) * length_m,
+        hazard_kind=["fault"] * n_faults + ["obstacle"] * n_obstacles,
+    )
+
+
+def run_network(max_seconds=600.0, **params):
+    timer = StageTimer("sim_network")
+    try:
+        with timer.stage("generate"):
+            net = generate_network(**params)
+        summary = net.run(max_seconds=max_seconds)
+    except BaseException:
+        timer.finish("error")
+        raise
+    timer.add("step", summary["wall_s"], calls=net.steps)
+    timer.count("steps", net.steps)
+    return {"summary": summary, "events": net.events, "timings": timer.finish()}
+
+
+# =====================================================
+# Rendering (runs inside the simulation worker, see sim_service)
+# =====================================================
+class NetworkScenario:
+    """Renders a generated network through the shared SimulationEngine."""
+
+    def __init__(self, max_seconds=600.0, **params):
+        self.max_seconds = max_seconds
+        self.params = params
+
+    def setup(self, engine):
+        from panda3d.core import CardMaker, LineSegs
+
+        self.engine = engine
+        self.finished = False
+        self.net = net = generate_network(**self.params)
+        self._scale = SCENE_LENGTH / net.length
+        n_tracks = int(net.track.max()) + 1 if net.n else 1
+        self._x = (np.arange(n_tracks) - (n_tracks - 1) / 2.0) * TRACK_SPACING
+
+        # own rails per track instead of the engine's single line
+        engine.track.hide()
+        ls = LineSegs()
+        ls.setThickness(2.0)
+        ls.setColor(0.8, 0.8, 0.8, 1)
+        for x in self._x:
+            for rail in (x - 4, x + 4):
+                ls.moveTo(rail, -SCENE_LENGTH / 2, -6.5)
+                ls.drawTo(rail, SCENE_LENGTH / 2, -6.5)
+        engine.scene.attachNewNode(ls.create())
+
+        for x, y, kind in zip(self._x[net.h_track], self._y(net.h_pos), net.h_kind):
+            cm = CardMaker(kind)
+            cm.setFrame(-6, 6, -0.5, 0.5)
+            marker = engine.scene.attachNewNode(cm.generate())
+            marker.setPos(x, y, -6.5)
+            marker.setColor((1, 0, 0, 1) if kind == "fault" else (1, 0.6, 0, 1))
+
+        self.nodes = []
+        for i, (x, y) in enumerate(zip(self._x[net.track], self._y(net.pos))):
+            color = (0.2, 0.7, 1, 1) if net.dir[i] > 0 else (1, 0.3, 0.3, 1)
+            node = engine.spawn_train(f"Train {i}", color, (x, y, 0))
+            node.setScale(0.5)
+            self.nodes.append(node)
+        engine.log(f"🚆 {net.n} trains on {n_tracks} tracks, {net.h_pos.size} hazards")
+
+    def _y(self, pos):
+        return pos * self._scale - SCENE_LENGTH / 2
+
+    def update(self, dt):
+        net = self.net
+        seen = len(net.events)
+        net.step(dt)
+        for node, y, state in zip(self.nodes, self._y(net.pos), net.state):
+            node.setY(y)
+            if state == EXITED:
+                node.hide()
+        for ev in net.events[seen:]:
+            if ev["to"] == "COLLIDED":
+                self.engine.log(f"💥 Train {ev['train']} collided with {ev['with']}")
+            elif ev["to"] == "STOPPED":
+                self.engine.log(f"✅ Train {ev['train']} stopped on track {ev['track']}")
+        self.finished = net.finished or net.time >= self.max_seconds
+
+
+# =====================================================
+# API
+# =====================================================
+class NetworkParams(BaseModel):
+    n_tracks: int = Field(4, ge=1, le=64)
+    n_trains: int = Field(40, ge=1, le=100_000)
+    n_faults: int = Field(2, ge=0, le=100_000)
+    n_obstacles: int = Field(2, ge=0, le=100_000)
+    length_m: float = Field(5000.0, gt=0, le=1_000_000)
+    speed_kmph: range_param(gt=0, le=500) = [40.0, 80.0]
+    decel: range_param(gt=0, le=10) = [0.8, 1.4]
+    plan_decel: Optional[float] = Field(None, gt=0, le=10, description="deceleration assumed when deciding to brake; default: each train's own")
+    accel: float = Field(0.5, gt=0, le=10)
+    min_gap: float = Field(60.0, ge=0, le=10_000)
+    detection_range: float = Field(300.0, gt=0, le=10_000)
+    layout: str = "one_way"
+    seed: int = 0
+    max_seconds: float = Field(600.0, gt=0, le=3600)
+
+
+def check_network(params):
+    """ValueError for what NetworkParams cannot express: range order, layout and the size of the run."""
+    check_ranges(params, RANGE_FIELDS)
+    if params["layout"] not in LAYOUTS:
+        raise ValueError(f"layout must be one of {LAYOUTS}")
+    if params["n_trains"] * params["max_seconds"] > MAX_TRAIN_SECONDS:
+        raise ValueError(f"n_trains x max_seconds must be at most {MAX_TRAIN_SECONDS}")
+
+
+@router.post("/network")
+async def simulate_network(request: Request, params: Optional[NetworkParams] = None, render: bool = False,
+                           quality: str = DEFAULT_CAPTURE, profile: bool = False, profile_mode: str = "sample"):
+    """Simulate a multi-train section; headless JSON by default, a rendered video with ?render=true."""
+    params = params or NetworkParams()
+    params = params.model_dump() if hasattr(params, "model_dump") else params.dict()
+    try:
+        check_network(params)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if render and params["n_trains"] > MAX_RENDER_TRAINS:
+        raise HTTPException(status_code=422, detail=f"Rendering is limited to {MAX_RENDER_TRAINS} trains")
+    prof = new_profile("sim_network", profile_mode) if profile else None
+
+    if not render:
+        result = await run_in_threadpool(run_profiled, prof, run_network, **params)
+        if prof:
+            result["profile"] = prof.info()
+        return {"params": params, **result}
+    return await serve_scenario(request, "network", params, quality, filename="network.mp4", profile=prof)
+
+
+# =====================================================
+# CLI
+# =====================================================
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Headless multi-train network simulation.")
+    ap.add_argument("--tracks", type=int, default=4)
+    ap.add_argument("--trains", type=int, default=40)
+    ap.add_argument("--faults", type=int, default=2)
+    ap.add_argument("--obstacles", type=int, default=2)
+    ap.add_argument("--length", type=float, default=5000.0, help="m")
+    ap.add_argument("--speed", type=float, nargs="+", default=[40.0, 80.0], help="km/h, value or LOW HIGH")
+    ap.add_argument("--decel", type=float, nargs="+", default=[0.8, 1.4], help="m/s^2, value or LOW HIGH")
+    ap.add_argument("--plan-decel", type=float, default=None)
+    ap.add_argument("--min-gap", type=float, default=60.0, help="m")
+    ap.add_argument("--layout", choices=LAYOUTS, default="one_way")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--max-seconds", type=float, default=600.0)
+    ap.add_argument("--events", action="store_true", help="print every state change too")
+    args = ap.parse_args(argv)
+
+    # same checks as the endpoint
+    try:
+        params = NetworkParams(
+            n_tracks=args.tracks, n_trains=args.trains, n_faults=args.faults, n_obstacles=args.obstacles,
+            length_m=args.length, speed_kmph=range_arg(args.speed), decel=range_arg(args.decel),
+            plan_decel=args.plan_decel, min_gap=args.min_gap, layout=args.layout, seed=args.seed,
+            max_seconds=args.max_seconds,
+        ).model_dump()
+        check_network(params)
+    except (ValidationError, ValueError) as e:
+        ap.error(str(e))
+
+    result = run_network(**params)
+    print(json.dumps(result if args.events else result["summary"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
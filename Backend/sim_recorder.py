@@ -0,0 +1,134 @@
+import os
+import queue
+import shutil
+import threading
+import subprocess
+
+import cv2  # type: ignore
+import numpy as np  # type: ignore
+
+# ---------------- CONFIG ----------------
+RECORD_FPS = 30
+# frames buffered between the simulation and the encoder thread; the simulation
+# blocks when the encoder falls behind, so memory stays constant for any run length
+QUEUE_FRAMES = 8
+# raw input layouts (ffmpeg pix_fmt names) -> channels, and the OpenCV conversion to BGR
+PIX_FMTS = {"rgb24": 3, "bgr24": 3, "rgba": 4, "bgra": 4}
+_TO_BGR = {"rgb24": cv2.COLOR_RGB2BGR, "rgba": cv2.COLOR_RGBA2BGR, "bgra": cv2.COLOR_BGRA2BGR}
+
+_STOP = object()
+
+
+class FrameRecorder:
+    """
+    Streams raw frames into a video encoder running on a background thread.
+
+    Uses ffmpeg (H.264, fed raw frames over a pipe) when it is installed and
+    OpenCV's mp4v writer otherwise. `pix_fmt` is the layout of the frames as
+    captured and `flip` marks bottom-up frames; both are handled by the encoder,
+    so callers never reorder channels or flip rows themselves. The file is
+    written next to `path` and only moved into place by close(), so a
+    half-written video is never served.
+
+    acquire() hands out frames from a preallocated pool that is recycled once
+    each frame has been encoded, so a long recording allocates nothing per frame.
+    """
+
+    def __init__(self, path, width, height, fps=RECORD_FPS, pix_fmt="rgb24", flip=False):
+        if pix_fmt not in PIX_FMTS:
+            raise ValueError(f"Unsupported pix_fmt {pix_fmt!r}, expected one of {tuple(PIX_FMTS)}")
+        self.path = path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pix_fmt = pix_fmt
+        self.flip = flip
+        self.frames_written = 0
+        self._tmp_path = f"{path}.part.mp4"
+        self._queue = queue.Queue(maxsize=QUEUE_FRAMES)
+        self._error = None
+
+        shape = (height, width, PIX_FMTS[pix_fmt])
+        self._free = queue.Queue()
+        self._pool = set()
+        for _ in range(QUEUE_FRAMES + 1):
+            buf = np.empty(shape, dtype=np.uint8)
+            self._pool.add(id(buf))
+            self._free.put(buf)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._proc = None
+        self._writer = None
+        if shutil.which("ffmpeg"):
+            self._proc = subprocess.Popen([
+                "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                "-f", "rawvideo", "-pix_fmt", pix_fmt, "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+                *(["-vf", "vflip"] if flip else []),
+                "-vcodec", "libx264", "-crf", "28", "-preset", "fast", "-pix_fmt", "yuv420p",
+                self._tmp_path,
+            ], stdin=subprocess.PIPE)
+        else:
+            # fallback: mp4v via OpenCV (less efficient, expects top-down BGR)
+            self._writer = cv2.VideoWriter(self._tmp_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+            self._bgr = np.empty((height, width, 3), dtype=np.uint8)
+            self._flipped = np.empty((height, width, 3), dtype=np.uint8)
+
+        self._thread = threading.Thread(target=self._run, name="FrameRecorder", daemon=True)
+        self._thread.start()
+
+    @property
+    def encoder(self):
+        return "ffmpeg" if self._proc is not None else "opencv"
+
+    def acquire(self):
+        """A free HxWxC frame from the pool; blocks while every pooled frame is still queued."""
+        if self._error is not None:
+            raise RuntimeError(f"Video encoder failed: {self._error}")
+        return self._free.get()
+
+    def write(self, frame):
+        """Queue one HxWxC frame in `pix_fmt`; blocks while the encoder is QUEUE_FRAMES behind."""
+        if self._error is not None:
+            raise RuntimeError(f"Video encoder failed: {self._error}")
+        self._queue.put(frame)
+
+    def close(self):
+        """Flush the queue, finish the encoder and move the video into place. Returns the path."""
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._proc is not None:
+            self._proc.stdin.close()
+            if self._proc.wait() != 0 and self._error is None:
+                self._error = f"ffmpeg exited with {self._proc.returncode}"
+        else:
+            self._writer.release()
+        if self._error is not None:
+            raise RuntimeError(f"Video encoder failed: {self._error}")
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is _STOP:
+                return
+            try:
+                if self._error is not None:
+                    continue  # drain so the producer never blocks on a dead encoder
+                if self._proc is not None:
+                    self._proc.stdin.write(memoryview(frame).cast("B"))
+                else:
+                    self._writer.write(self._to_bgr(frame))
+                self.frames_written += 1
+            except Exception as e:  # broken pipe, codec error, ...
+                self._error = e
+            finally:
+                if id(frame) in self._pool:
+                    self._free.put(frame)
+
+    def _to_bgr(self, frame):
+        if self.pix_fmt != "bgr24":
+            frame = cv2.cvtColor(frame, _TO_BGR[self.pix_fmt], dst=self._bgr)
+        if self.flip:
+            frame = cv2.flip(frame, 0, dst=self._flipped)
+        return frame
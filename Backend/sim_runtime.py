@@ -0,0 +1,36 @@
+import os
+
+from sim_recorder import RECORD_FPS
+
+# ---------------- CONFIG ----------------
+# physics advances by exactly SIM_DT per tick, and every tick is one recorded frame,
+# so a run is independent of wall-clock speed and identical inputs give identical output
+SIM_FPS = RECORD_FPS
+SIM_DT = 1.0 / SIM_FPS
+MAX_SIM_SECONDS = 300.0  # guard against scenarios that never reach a stop
+
+# recording presets: name -> (width, height, fps). The simulation always ticks at
+# SIM_FPS; a lower capture fps renders only every SIM_FPS/fps-th tick.
+CAPTURE_PRESETS = {
+    "standard": (1280, 720, RECORD_FPS),
+    "preview": (640, 360, 15),
+}
+DEFAULT_CAPTURE = os.environ.get("SURAKSHA_SIM_CAPTURE", "standard")
+if DEFAULT_CAPTURE not in CAPTURE_PRESETS:
+    # fail at startup rather than answer every default simulation request with 422
+    raise ValueError(f"SURAKSHA_SIM_CAPTURE={DEFAULT_CAPTURE!r} is not one of {tuple(CAPTURE_PRESETS)}")
+
+
+def capture_settings(preset=DEFAULT_CAPTURE):
+    width, height, fps = CAPTURE_PRESETS[preset]
+    return {"width": width, "height": height, "fps": fps}
+
+
+def use_fixed_clock(fps=SIM_FPS):
+    """Switch Panda3D's global clock to non-real-time mode at a fixed frame rate."""
+    from panda3d.core import ClockObject  # keeps the constants importable without Panda3D
+
+    clock = ClockObject.getGlobalClock()
+    clock.setMode(ClockObject.MNonRealTime)
+    clock.setFrameRate(fps)
+    return clock
@@ -0,0 +1,190 @@
+import queue
+import asyncio
+import importlib
+import itertools
+import threading
+import traceback
+import multiprocessing as mp
+
+from fastapi import HTTPException
+
+from metrics import QUEUE_DEPTH, StageTimer
+
+# ---------------- CONFIG ----------------
+# scenario name -> (module, class); classes are imported inside the worker only
+SCENARIOS = {
+    "two_train": ("train_fault_3dsimulation", "TrainSafetyDemo"),
+    "obstacle": ("train_obstacle_3dsimulation", "TwoTrainSafetyDemo"),
+    "network": ("sim_network", "NetworkScenario"),
+}
+QUEUE_LIMIT = 32  # queued + running simulations before new requests get 429
+
+
+def _build_scenario(kind, params):
+    module, cls = SCENARIOS[kind]
+    return getattr(importlib.import_module(module), cls)(**params)
+
+
+def _worker_main(jobs, results):
+    """Simulation worker process: one SimulationEngine for its whole life, jobs run one at a time."""
+    from sim_engine import SimulationEngine  # Panda3D is only ever loaded in this process
+
+    engine = SimulationEngine()
+    results.put(("ready", True, None))
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        job_id, kind, params, video_path, capture, profile = job
+        try:
+            scenario = _build_scenario(kind, params)
+            if profile is None:
+                out = engine.run(scenario, video_path, **capture)
+            else:
+                from profiling import JobProfile
+                with JobProfile.from_spec(profile):
+                    out = engine.run(scenario, video_path, **capture)
+            results.put((job_id, True, out))
+        except Exception:
+            results.put((job_id, False, traceback.format_exc()))
+
+
+def _resolve(fut, ok, payload):
+    if fut.done():
+        return
+    if ok:
+        fut.set_result(payload)
+    else:
+        fut.set_exception(RuntimeError(payload))
+
+
+class SimulationService:
+    """
+    Owns the simulation worker process and its job queue.
+
+    Panda3D supports a single ShowBase per process and its startup is slow, so
+    every simulation runs in one long-lived worker that keeps the engine warm.
+    Requests are queued to it and awaited from the event loop; if the worker
+    dies, pending jobs fail and the next request starts a fresh worker.
+    """
+
+    def __init__(self):
+        self._ctx = mp.get_context("spawn")
+        self._proc = None
+        self._jobs = None
+        self._pending = {}   # job_id -> (loop, future)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.ready = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._proc is not None and self._proc.is_alive():
+                return
+            self._fail_pending("Simulation worker restarted")
+            self.ready.clear()
+            self._jobs = self._ctx.Queue()
+            results = self._ctx.Queue()
+            self._proc = self._ctx.Process(target=_worker_main, args=(self._jobs, results),
+                                           name="suraksha-sim-worker", daemon=True)
+            self._proc.start()
+            threading.Thread(target=self._collect, args=(self._proc, results),
+                             name="suraksha-sim-results", daemon=True).start()
+
+    def stop(self):
+        with self._lock:
+            if self._proc is None:
+                return
+            if self._proc.is_alive():
+                self._jobs.put(None)
+                self._proc.join(timeout=5)
+                if self._proc.is_alive():
+                    self._proc.terminate()
+            self._proc = None
+            self._fail_pending("Simulation service stopped")
+
+    @property
+    def alive(self):
+        return self._proc is not None and self._proc.is_alive()
+
+    @property
+    def queue_depth(self):
+        return len(self._pending)
+
+    def _fail_pending(self, reason):
+        pending, self._pending = self._pending, {}
+        for loop, fut in pending.values():
+            loop.call_soon_threadsafe(_resolve, fut, False, reason)
+
+    def _collect(self, proc, results):
+        while True:
+            try:
+                job_id, ok, payload = results.get(timeout=1.0)
+            except queue.Empty:
+                if not proc.is_alive():
+                    if proc is self._proc:
+                        self._fail_pending(f"Simulation worker exited with code {proc.exitcode}")
+                    return
+                continue
+            if job_id == "ready":
+                self.ready.set()
+                continue
+            entry = self._pending.pop(job_id, None)
+            if entry is not None:
+                loop, fut = entry
+                loop.call_soon_threadsafe(_resolve, fut, ok, payload)
+
+    async def run(self, kind, params=None, video_path=None, capture=None, profile=None):
+        """Queue a scenario on the worker and wait for its result dict; capture holds width/height/fps,
+        profile a JobProfile.spec() to run the job under in the worker."""
+        if kind not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {kind!r}")
+        if self.queue_depth >= QUEUE_LIMIT:
+            raise HTTPException(status_code=429, detail="Simulation queue is full, retry later",
+                                headers={"Retry-After": "10"})
+        self.start()
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        job_id = next(self._ids)
+        self._pending[job_id] = (loop, fut)
+        timer = StageTimer(f"sim_{kind}")
+        self._jobs.put((job_id, kind, params or {}, video_path, capture or {}, profile))
+        try:
+            result = await fut
+        except BaseException:
+            timer.finish("error")
+            raise
+        # the worker reports its own timings; the rest of the job's wall time is queueing
+        timer.add("run", result["wall_s"])
+        frames = result.get("frames") or 0
+        cap = result.get("capture") or {}
+        if frames and cap.get("render_ms_per_frame") is not None:
+            timer.add("render", cap["render_ms_per_frame"] * frames / 1000, calls=frames)
+            timer.add("capture_copy", cap["copy_ms_per_frame"] * frames / 1000, calls=frames)
+        timer.count("steps", result.get("steps", 0))
+        timer.count("frames", frames)
+        result["timings"] = timer.finish()
+        return result
+
+
+_service = None
+
+
+def get_service() -> SimulationService:
+    """The process-wide simulation service, started on first use."""
+    global _service
+    if _service is None:
+        _service = SimulationService()
+        QUEUE_DEPTH.set_function(lambda: _service.queue_depth, queue="simulation")
+    _service.start()
+    return _service
+
+
+def current_service():
+    """The simulation service if one has been started, without starting it."""
+    return _service
+
+
+def stop_service():
+    if _service is not None:
+        _service.stop()
@@ -0,0 +1,191 @@
+"""
+Tiled inference for high-resolution track footage.
+
+Small defects (cracks, missing fasteners) shrink to a few pixels when a 1080p or
+4K frame is scaled down to the model's input size. TiledDetector instead cuts
+the rail region of each frame into overlapping TILE_SIZE tiles, runs them at
+full resolution and maps the boxes back into frame coordinates:
+
+    roi        only TRACK_ROI (fractions of the frame) is tiled; the rest is never inferred
+    batching   tiles of consecutive frames share model calls of TILE_BATCH tiles
+    skipping   a tile that looks the same as when it was last inferred reuses that
+               result, for at most TILE_MAX_REUSE frames in a row
+    merging    boxes from overlapping tiles go through class-wise NMS, and the two
+               halves of a box cut by a tile seam are joined
+
+Frames come back in order, at most TILE_MAX_FRAMES frames late. The cost per
+frame is bounded by the tile count of the grid (see TiledDetector.info()).
+"""
+import os
+from collections import deque
+
+import cv2  # type: ignore
+import numpy as np
+
+# ---------------- CONFIG ----------------
+TILE_SIZE = int(os.environ.get("SURAKSHA_TILE_SIZE", "640"))
+TILE_OVERLAP = 0.2          # fraction of a tile shared with its neighbour
+TILE_BATCH = int(os.environ.get("SURAKSHA_TILE_BATCH", "16"))
+TILE_MAX_FRAMES = 8         # frames held back waiting for a full batch
+# (x0, y0, x1, y1) as fractions of the frame: the lower middle, where the rails run
+TRACK_ROI = tuple(float(v) for v in os.environ.get("SURAKSHA_TRACK_ROI", "0.1,0.3,0.9,1.0").split(","))
+# a tile is unchanged when no pixel of its TILE_THUMB x TILE_THUMB grey thumbnail moved by
+# more than TILE_CHANGE_THRESHOLD levels; the max (not the mean) keeps a new crack visible
+TILE_THUMB = 64
+TILE_CHANGE_THRESHOLD = 8.0
+TILE_MAX_REUSE = 10
+NMS_IOU = 0.5
+MERGE_IOS = 0.6             # intersection over the smaller box: two parts of one object
+
+
+def roi_rect(shape, roi=TRACK_ROI):
+    """Pixel rectangle (x0, y0, x1, y1) of `roi` in a frame of `shape`."""
+    h, w = shape[:2]
+    x0, y0 = int(roi[0] * w), int(roi[1] * h)
+    x1, y1 = int(round(roi[2] * w)), int(round(roi[3] * h))
+    return x0, y0, max(x0 + 1, min(w, x1)), max(y0 + 1, min(h, y1))
+
+
+def _starts(lo, hi, size, stride):
+    if hi - lo <= size:
+        return [lo]
+    starts = list(range(lo, hi - size, stride))
+    starts.append(hi - size)  # last tile flush with the ROI edge
+    return starts
+
+
+def tile_grid(shape, roi=TRACK_ROI, size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Corners (x0, y0, x1, y1) of equal, overlapping tiles covering the ROI of a frame."""
+    rx0, ry0, rx1, ry1 = roi_rect(shape, roi)
+    tw, th = min(size, rx1 - rx0), min(size, ry1 - ry0)
+    sx, sy = max(1, int(tw * (1 - overlap))), max(1, int(th * (1 - overlap)))
+    return [(x, y, x + tw, y + th) for y in _starts(ry0, ry1, th, sy) for x in _starts(rx0, rx1, tw, sx)]
+
+
+def merge_boxes(dets, iou_thr=NMS_IOU, ios_thr=MERGE_IOS):
+    """
+    Class-wise NMS over (x1, y1, x2, y2, conf, cls) boxes from overlapping tiles.
+    Boxes that overlap the kept one by IoU > iou_thr, or that mostly lie inside it
+    or it inside them (IoS > ios_thr), are dropped and the kept box grows to cover them.
+    """
+    if len(dets) < 2:
+        return list(dets)
+    boxes = np.array([d[:4] for d in dets], dtype=np.float32)
+    conf = np.array([d[4] for d in dets], dtype=np.float32)
+    labels = np.array([d[5] for d in dets], dtype=object)
+    areas = np.maximum(1.0, (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]))
+    done = np.zeros(len(dets), dtype=bool)
+    merged = []
+    for i in np.argsort(-conf):
+        if done[i]:
+            continue
+        done[i] = True
+        box = boxes[i].copy()
+        idx = np.nonzero(~done & (labels == labels[i]))[0]
+        if len(idx):
+            iw = np.clip(np.minimum(box[2], boxes[idx, 2]) - np.maximum(box[0], boxes[idx, 0]), 0, None)
+            ih = np.clip(np.minimum(box[3], boxes[idx, 3]) - np.maximum(box[1], boxes[idx, 1]), 0, None)
+            inter = iw * ih
+            iou = inter / (areas[i] + areas[idx] - inter)
+            ios = inter / np.minimum(areas[i], areas[idx])
+            hit = idx[(iou > iou_thr) | (ios > ios_thr)]
+            if len(hit):
+                done[hit] = True
+                box[:2] = np.minimum(box[:2], boxes[hit, :2].min(axis=0))
+                box[2:] = np.maximum(box[2:], boxes[hit, 2:].max(axis=0))
+        merged.append((*box.tolist(), float(conf[i]), labels[i]))
+    return merged
+
+
+class TiledDetector:
+    """
+    Runs frames through `predict(crops) -> [[(x1, y1, x2, y2, conf, cls), ...] per crop]`
+    tile by tile. submit() and flush() return finished frames as
+    (frame_id, frame, detections), in submission order and in frame coordinates.
+    With reuse=False every tile is inferred (unrelated images, e.g. bulk photos).
+    """
+
+    def __init__(self, predict, timer, roi=TRACK_ROI, size=TILE_SIZE, overlap=TILE_OVERLAP, batch=TILE_BATCH,
+                 reuse=True):
+        self.predict = predict
+        self.timer = timer
+        self.roi = roi
+        self.size = size
+        self.overlap = overlap
+        self.batch = max(1, batch)
+        self.reuse = reuse
+        self._grid = []
+        self._grid_shape = None
+        self._last = {}          # tile index -> [thumbnail, slot, times reused]
+        self._pending = []       # (crop, slot) not yet inferred
+        self._frames = deque()   # (frame_id, frame, [(x0, y0, slot)])
+        self.stats = {"frames": 0, "tiles": 0, "tiles_inferred": 0, "tiles_skipped": 0, "model_calls": 0}
+
+    def submit(self, frame_id, frame):
+        with self.timer.stage("tile"):
+            if frame.shape[:2] != self._grid_shape:
+                self._grid = tile_grid(frame.shape, self.roi, self.size, self.overlap)
+                self._grid_shape = frame.shape[:2]
+                self._last = {}
+            tiles = []
+            for i, (x0, y0, x1, y1) in enumerate(self._grid):
+                crop = frame[y0:y1, x0:x1]
+                slot = self._reusable(i, crop) if self.reuse else None
+                if slot is None:
+                    slot = {"dets": None}
+                    self._pending.append((crop, slot))
+                    if self.reuse:
+                        self._last[i][1] = slot
+                tiles.append((x0, y0, slot))
+            self._frames.append((frame_id, frame, tiles))
+        self.stats["frames"] += 1
+        self.stats["tiles"] += len(tiles)
+        return self._run(force=len(self._frames) >= TILE_MAX_FRAMES)
+
+    def flush(self):
+        return self._run(force=True)
+
+    def _reusable(self, i, crop):
+        """The slot of tile i's last inference if the tile has not changed since, else None."""
+        grey = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        thumb = cv2.resize(grey, (TILE_THUMB, TILE_THUMB), interpolation=cv2.INTER_AREA)
+        last = self._last.get(i)
+        if last is not None and last[2] < TILE_MAX_REUSE and \
+                float(cv2.absdiff(thumb, last[0]).max()) <= TILE_CHANGE_THRESHOLD:
+            last[2] += 1
+            self.stats["tiles_skipped"] += 1
+            self.timer.count("tiles_skipped")
+            return last[1]
+        # compared against the thumbnail of the inferred tile, so slow drift still triggers
+        self._last[i] = [thumb, None, 0]
+        return None
+
+    def _run(self, force):
+        while len(self._pending) >= self.batch or (force and self._pending):
+            chunk = self._pending[:self.batch]
+            del self._pending[:self.batch]
+            for (_, slot), dets in zip(chunk, self.predict([crop for crop, _ in chunk])):
+                slot["dets"] = dets
+            self.stats["model_calls"] += 1
+            self.stats["tiles_inferred"] += len(chunk)
+            self.timer.count("tiles", len(chunk))
+
+        finished = []
+        while self._frames and all(slot["dets"] is not None for _, _, slot in self._frames[0][2]):
+            frame_id, frame, tiles = self._frames.popleft()
+            with self.timer.stage("nms"):
+                dets = [(x1 + x0, y1 + y0, x2 + x0, y2 + y0, conf, cls)
+                        for x0, y0, slot in tiles for x1, y1, x2, y2, conf, cls in slot["dets"]]
+                finished.append((frame_id, frame, merge_boxes(dets)))
+        return finished
+
+    def info(self):
+        """Grid and tile counts of the run so far, for results and benchmarks."""
+        frames = max(1, self.stats["frames"])
+        return {
+            "tile_size": self.size, "overlap": self.overlap, "roi": list(self.roi), "batch": self.batch,
+            "tiles_per_frame": len(self._grid),
+            **self.stats,
+            "inferred_per_frame": round(self.stats["tiles_inferred"] / frames, 2),
+            "skip_ratio": round(self.stats["tiles_skipped"] / max(1, self.stats["tiles"]), 3),
+        }
@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, Form, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+# ---------------- CONFIG ----------------
+UPLOAD_DIR = Path(__file__).parent.resolve() / "uploads"
+PARTIAL_DIR = UPLOAD_DIR / ".partial"
+CHUNK_SIZE = 1024 * 1024  # 1MB
+MAX_UPLOAD_BYTES = int(os.environ.get("SURAKSHA_MAX_UPLOAD_MB", "4096")) * 1024 * 1024
+FORM_OVERHEAD_BYTES = 1024 * 1024  # multipart boundaries and the small form fields
+MAX_KEPT_UPLOADS = int(os.environ.get("SURAKSHA_KEPT_UPLOADS", "20"))  # older saved uploads are deleted
+PARTIAL_TTL_S = 24 * 3600  # resumable uploads untouched this long are abandoned
+
+router = APIRouter()
+
+
+def _write_chunk(out_f, hasher, chunk):
+    # hashing and the disk write share one threadpool hop per chunk
+    hasher.update(chunk)
+    out_f.write(chunk)
+
+
+def _hash_file(path: Path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher
+
+
+def _too_large(max_bytes):
+    return HTTPException(status_code=413, detail=f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+
+
+def upload_path(dest_dir: Path, filename: str) -> Path:
+    """A path in dest_dir no other upload gets; the client's name (and extension) stays readable after the prefix."""
+    return dest_dir / f"{uuid.uuid4().hex[:12]}_{Path(filename).name}"
+
+
+async def save_upload(file: UploadFile, dest: Path, max_bytes: int = MAX_UPLOAD_BYTES, timer=None) -> dict:
+    """
+    Stream an UploadFile to dest (see upload_path()) in chunks without blocking
+    the event loop. The SHA-256 is computed on the fly, so callers get a content
+    key for free. Time spent hashing and writing is added to `timer` as "upload_copy".
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f"{dest.name}.{uuid.uuid4().hex[:8]}.part")
+    hasher = hashlib.sha256()
+    size = 0
+    chunks = 0
+    copy_s = 0.0
+    out_f = await run_in_threadpool(open, tmp, "wb")
+    try:
+        while chunk := await file.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise _too_large(max_bytes)
+            t0 = time.perf_counter()
+            await run_in_threadpool(_write_chunk, out_f, hasher, chunk)
+            copy_s += time.perf_counter() - t0
+            chunks += 1
+    except BaseException:
+        out_f.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    out_f.close()
+    os.replace(tmp, dest)
+    await run_in_threadpool(prune_uploads, dest.parent)
+    if timer is not None:
+        timer.add("upload_copy", copy_s, calls=chunks)
+        timer.count("upload_bytes", size)
+    return {"path": str(dest), "filename": dest.name, "size": size, "sha256": hasher.hexdigest()}
+
+
+class UploadLimitMiddleware:
+    """
+    413 for multipart bodies over the upload limit, before they are received.
+    Starlette spools the whole form to a temp file before an endpoint (and
+    save_upload()) runs, so the limit is enforced on the raw body: from
+    Content-Length before the first byte is read, else as the chunks arrive.
+    The error is raised inside the app, so it still gets CORS headers.
+    """
+
+    def __init__(self, app, paths=("/analyze",), max_bytes=MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES):
+        self.app = app
+        self.paths = tuple(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(self.paths):
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        try:
+            declared = int(headers.get(b"content-length", b"-1"))
+        except ValueError:
+            declared = -1
+        max_bytes = self.max_bytes
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            if declared > max_bytes:
+                raise _too_large(max_bytes - FORM_OVERHEAD_BYTES)
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise _too_large(max_bytes - FORM_OVERHEAD_BYTES)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+# =====================================================
+# RESUMABLE CHUNKED UPLOADS
+# =====================================================
+# POST /uploads            -> start, returns upload_id
+# PUT  /uploads/{id}       -> append the request body at the Upload-Offset header
+# GET  /uploads/{id}       -> current offset, to resume after a dropped connection
+# POST /uploads/{id}/complete -> finalize; pass upload_id to an analyze endpoint
+# Offsets live on disk (size of the .part file), so uploads survive a restart;
+# the running hash is kept in memory and rebuilt from the part file if lost.
+# Uploads nobody touched for PARTIAL_TTL_S are deleted by prune_uploads().
+
+_hashers = {}
+_locks = {}
+
+
+def _meta_path(upload_id: str) -> Path:
+    return PARTIAL_DIR / f"{upload_id}.json"
+
+
+def _part_path(upload_id: str) -> Path:
+    return PARTIAL_DIR / f"{upload_id}.part"
+
+
+def _load_meta(upload_id: str) -> dict:
+    try:
+        uuid.UUID(hex=upload_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Unknown upload")
+    meta_path = _meta_path(upload_id)
+    if not meta_path.exists():
+        raise HTTPException(status_code=404, detail="Unknown upload")
+    return json.loads(meta_path.read_text())
+
+
+def _status(upload_id: str, meta: dict) -> dict:
+    part = _part_path(upload_id)
+    offset = part.stat().st_size if part.exists() else 0
+    return {"upload_id": upload_id, "filename": meta["filename"], "size": meta["size"],
+            "offset": offset, "complete": bool(meta.get("sha256")), "chunk_size": CHUNK_SIZE}
+
+
+@router.post("")
+async def start_upload(filename: str = Form(...), size: Optional[int] = Form(None)):
+    if size is not None and size > MAX_UPLOAD_BYTES:
+        raise _too_large(MAX_UPLOAD_BYTES)
+    await run_in_threadpool(prune_uploads)
+    PARTIAL_DIR.mkdir(parents=True, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    meta = {"filename": Path(filename).name, "size": size}
+    _meta_path(upload_id).write_text(json.dumps(meta))
+    _part_path(upload_id).touch()
+    _hashers[upload_id] = hashlib.sha256()
+    return _status(upload_id, meta)
+
+
+@router.get("/{upload_id}")
+async def upload_status(upload_id: str):
+    return _status(upload_id, _load_meta(upload_id))
+
+
+@router.put("/{upload_id}")
+async def upload_chunk(upload_id: str, request: Request):
+    meta = _load_meta(upload_id)
+    if meta.get("sha256"):
+        raise HTTPException(status_code=409, detail="Upload already complete")
+    lock = _locks.setdefault(upload_id, asyncio.Lock())
+    async with lock:
+        part = _part_path(upload_id)
+        offset = part.stat().st_size
+        try:
+            claimed = int(request.headers.get("Upload-Offset", offset))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Upload-Offset header")
+        if claimed != offset:
+            # client resumes from the offset we actually have
+            raise HTTPException(status_code=409, detail={"message": "Offset mismatch", "offset": offset})
+
+        hasher = _hashers.get(upload_id)
+        if hasher is None:
+            hasher = await run_in_threadpool(_hash_file, part)
+            _hashers[upload_id] = hasher
+
+        limit = min(MAX_UPLOAD_BYTES, meta["size"] or MAX_UPLOAD_BYTES)
+        out_f = await run_in_threadpool(open, part, "ab")
+        try:
+            async for chunk in request.stream():
+                if not chunk:
+                    continue
+                offset += len(chunk)
+                if offset > limit:
+                    raise _too_large(limit)
+                await run_in_threadpool(_write_chunk, out_f, hasher, chunk)
+        except BaseException:
+            # keep the part file consistent with the hash: drop this chunk entirely
+            out_f.close()
+            await run_in_threadpool(os.truncate, part, claimed)
+            _hashers.pop(upload_id, None)
+            raise
+        out_f.close()
+    return _status(upload_id, meta)
+
+
+@router.post("/{upload_id}/complete")
+async def complete_upload(upload_id: str):
+    meta = _load_meta(upload_id)
+    async with _locks.setdefault(upload_id, asyncio.Lock()):
+        part = _part_path(upload_id)
+        size = part.stat().st_size
+        if meta["size"] is not None and size != meta["size"]:
+            raise HTTPException(status_code=409, detail={"message": "Upload incomplete", "offset": size})
+        if not meta.get("sha256"):
+            hasher = _hashers.pop(upload_id, None) or await run_in_threadpool(_hash_file, part)
+            meta["sha256"] = hasher.hexdigest()
+            meta["size"] = size
+            _meta_path(upload_id).write_text(json.dumps(meta))
+    return _status(upload_id, meta) | {"sha256": meta["sha256"]}
+
+
+def claim_upload(upload_id: str, dest_dir: Path = UPLOAD_DIR) -> dict:
+    """Move a completed resumable upload into dest_dir and return the same info as save_upload()."""
+    meta = _load_meta(upload_id)
+    if not meta.get("sha256"):
+        raise HTTPException(status_code=409, detail="Upload not complete")
+    dest = upload_path(dest_dir, meta["filename"])
+    os.replace(_part_path(upload_id), dest)
+    os.utime(dest)  # kept as the newest upload by prune_uploads(), however long ago the chunks arrived
+    _meta_path(upload_id).unlink(missing_ok=True)
+    _locks.pop(upload_id, None)
+    prune_uploads(dest_dir)
+    return {"path": str(dest), "filename": dest.name, "size": meta["size"], "sha256": meta["sha256"]}
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def prune_uploads(upload_dir: Path = UPLOAD_DIR, keep: int = MAX_KEPT_UPLOADS, partial_ttl: float = PARTIAL_TTL_S):
+    """
+    Delete saved uploads beyond the newest `keep` (the latest runs still render
+    lazily from theirs) and resumable uploads untouched for `partial_ttl`,
+    together with their in-memory hash and lock.
+    """
+    now = time.time()
+    if PARTIAL_DIR.exists():
+        ids = {p.stem for p in PARTIAL_DIR.iterdir() if p.suffix in (".json", ".part")}
+        for upload_id in ids:
+            lock = _locks.get(upload_id)
+            if lock is not None and lock.locked():
+                continue
+            meta, part = _meta_path(upload_id), _part_path(upload_id)
+            if now - max(_mtime(meta), _mtime(part)) > partial_ttl:
+                part.unlink(missing_ok=True)
+                meta.unlink(missing_ok=True)
+    for upload_id in list(_hashers.keys() | _locks.keys()):
+        if not _meta_path(upload_id).exists():
+            _hashers.pop(upload_id, None)
+            _locks.pop(upload_id, None)
+
+    if upload_dir.exists():
+        # .part files are save_upload() writes still in progress
+        saved = sorted((p for p in upload_dir.iterdir() if p.is_file() and p.suffix != ".part"), key=_mtime)
+        for p in saved[:max(0, len(saved) - keep)]:
+            p.unlink(missing_ok=True)
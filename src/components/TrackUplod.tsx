@@ -10,19 +10,34 @@ const TrackUpload: React.FC<TrackUploadProps> = ({ onAnalysisComplete }) => {
   const [isDragOver, setIsDragOver] = useState(false);
   const [loading, setLoading] = useState(false);
   const [results, setResults] = useState<any | null>(null);
+  const [liveFaults, setLiveFaults] = useState<any[]>([]);
+  const [stage, setStage] = useState<string | null>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
 
   const handleFileSelect = async (file: File) => {
     if (file.type.startsWith("image/")) {
       const url = URL.createObjectURL(file);
       setUploadedImage(url);
+      setLiveFaults([]);
+      setStage(null);
 
+      const base = "http://127.0.0.1:8000";
+      const jobId = crypto.randomUUID();
       const formData = new FormData();
       formData.append("file", file);
+      formData.append("job_id", jobId);
+
+      // faults are streamed as soon as they are found, before the CSV and map are written
+      const events = new EventSource(`${base}/jobs/${jobId}/events`);
+      events.addEventListener("alert", (e) => setLiveFaults((prev) => [...prev, JSON.parse((e as MessageEvent).data)]));
+      events.addEventListener("stage", (e) => setStage(JSON.parse((e as MessageEvent).data).stage));
+      events.addEventListener("done", () => events.close());
+      // a failed job ends the stream; EventSource's own "error" would reconnect
+      events.addEventListener("failed", () => events.close());
 
       try {
         setLoading(true);
-        const res = await fetch("http://127.0.0.1:8000/analyze/track", {
+        const res = await fetch(`${base}/analyze/track`, {
           method: "POST",
           body: formData,
         });
@@ -39,7 +54,6 @@ const TrackUpload: React.FC<TrackUploadProps> = ({ onAnalysisComplete }) => {
           throw new Error("❌ Response is not valid JSON: " + rawText);
         }
 
-        const base = "http://127.0.0.1:8000";
         const artifacts = {
           image: base + data.artifacts.image,
           csv: base + data.artifacts.csv,
@@ -55,6 +69,8 @@ const TrackUpload: React.FC<TrackUploadProps> = ({ onAnalysisComplete }) => {
         console.error("❌ Upload/Analysis failed:", err);
         setResults({ error: err.message || "Unknown error occurred" });
       } finally {
+        events.close();
+        setStage(null);
         setLoading(false);
       }
     }
@@ -78,6 +94,7 @@ const TrackUpload: React.FC<TrackUploadProps> = ({ onAnalysisComplete }) => {
     if (uploadedImage) URL.revokeObjectURL(uploadedImage);
     setUploadedImage(null);
     setResults(null);
+    setLiveFaults([]);
     if (fileInputRef.current) fileInputRef.current.value = "";
   };
 
@@ -149,12 +166,27 @@ const TrackUpload: React.FC<TrackUploadProps> = ({ onAnalysisComplete }) => {
               <div className="relative rounded-xl overflow-hidden border-2 border-green-400/30 shadow-lg shadow-green-400/10">
                 <img src={uploadedImage} alt="Uploaded track" className="w-full h-auto max-h-[500px] object-contain bg-black" />
                 {loading && (
-                  <div className="absolute inset-0 flex items-center justify-center bg-black/50">
+                  <div className="absolute inset-0 flex flex-col items-center justify-center bg-black/50">
                     <Loader2 className="w-10 h-10 animate-spin text-green-400" />
+                    {stage && <p className="text-gray-200 text-sm mt-2">Writing {stage}…</p>}
                   </div>
                 )}
               </div>
 
+              {liveFaults.length > 0 && (
+                <div className="mt-4 p-4 bg-gray-800/50 rounded-lg border border-gray-700">
+                  <p className="text-white font-medium mb-2">Faults detected ({liveFaults.length})</p>
+                  <ul className="space-y-1 max-h-48 overflow-y-auto">
+                    {liveFaults.map((f) => (
+                      <li key={f.event_id} className="text-sm text-gray-300">
+                        <span className={f.decision === "DANGER" ? "text-red-400" : "text-orange-400"}>{f.decision}</span>{" "}
+                        {f.issue} ({Math.round(f.risk_pct)}% risk, conf {f.conf})
+                      </li>
+                    ))}
+                  </ul>
+                </div>
+              )}
+
               {results && (
                 <div className="mt-4 p-4 bg-gray-800/50 rounded-lg border border-gray-700">
                   {results.error ? (
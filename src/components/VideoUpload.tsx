@@ -5,25 +5,48 @@ interface VideoUploadProps {
   onAnalysisComplete?: (artifacts: { csv: string; map: string; video: string }) => void;
 }
 
+interface JobProgress {
+  frames_done: number;
+  frames_total: number | null;
+  percent: number | null;
+  fps: number | null;
+  eta_s: number | null;
+}
+
 const VideoUpload: React.FC<VideoUploadProps> = ({ onAnalysisComplete }) => {
   const [uploadedVideo, setUploadedVideo] = useState<string | null>(null);
   const [isDragOver, setIsDragOver] = useState(false);
   const [loading, setLoading] = useState(false);
   const [results, setResults] = useState<any | null>(null);
+  const [progress, setProgress] = useState<JobProgress | null>(null);
+  const [liveAlerts, setLiveAlerts] = useState<any[]>([]);
   const fileInputRef = useRef<HTMLInputElement>(null);
 
   const handleFileSelect = async (file: File) => {
     if (file.type.startsWith('video/')) {
       const url = URL.createObjectURL(file);
       setUploadedVideo(url);
+      setProgress(null);
+      setLiveAlerts([]);
 
+      const base = "http://127.0.0.1:8000";
+      const jobId = crypto.randomUUID();
       const formData = new FormData();
       formData.append("file", file);
       formData.append("speed", "80.0"); // backend expects this
+      formData.append("job_id", jobId);
+
+      // progress and hazards stream in while the job runs
+      const events = new EventSource(`${base}/jobs/${jobId}/events`);
+      events.addEventListener("progress", (e) => setProgress(JSON.parse((e as MessageEvent).data)));
+      events.addEventListener("alert", (e) => setLiveAlerts((prev) => [...prev, JSON.parse((e as MessageEvent).data)]));
+      events.addEventListener("done", () => events.close());
+      // a failed job ends the stream; EventSource's own "error" would reconnect
+      events.addEventListener("failed", () => events.close());
 
       try {
         setLoading(true);
-        const res = await fetch("http://127.0.0.1:8000/analyze/object", {
+        const res = await fetch(`${base}/analyze/object`, {
           method: "POST",
           body: formData,
         });
@@ -42,7 +65,6 @@ const VideoUpload: React.FC<VideoUploadProps> = ({ onAnalysisComplete }) => {
           throw new Error("❌ Response is not valid JSON: " + rawText);
         }
 
-        const base = "http://127.0.0.1:8000";
         const artifacts = {
           video: base + data.artifacts.video,
           csv: base + data.artifacts.csv,
@@ -60,6 +82,7 @@ const VideoUpload: React.FC<VideoUploadProps> = ({ onAnalysisComplete }) => {
         console.error("❌ Upload/Analysis failed:", err);
         setResults({ error: err.message || "Unknown error occurred" });
       } finally {
+        events.close();
         setLoading(false);
       }
     }
@@ -97,6 +120,8 @@ const VideoUpload: React.FC<VideoUploadProps> = ({ onAnalysisComplete }) => {
     }
     setUploadedVideo(null);
     setResults(null);
+    setProgress(null);
+    setLiveAlerts([]);
     if (fileInputRef.current) {
       fileInputRef.current.value = '';
     }
@@ -179,12 +204,43 @@ const VideoUpload: React.FC<VideoUploadProps> = ({ onAnalysisComplete }) => {
                   style={{ filter: 'brightness(1.1) contrast(1.05)' }}
                 />
                 {loading && (
-                  <div className="absolute inset-0 flex items-center justify-center bg-black/50">
+                  <div className="absolute inset-0 flex flex-col items-center justify-center bg-black/50">
                     <Loader2 className="w-10 h-10 animate-spin text-green-400" />
+                    {progress && (
+                      <div className="mt-4 w-2/3">
+                        <div className="h-2 bg-gray-700 rounded-full overflow-hidden">
+                          <div
+                            className="h-full bg-green-400 transition-all"
+                            style={{ width: `${progress.percent ?? 0}%` }}
+                          />
+                        </div>
+                        <p className="text-gray-200 text-sm mt-2 text-center">
+                          Frame {progress.frames_done}{progress.frames_total ? ` / ${progress.frames_total}` : ""}
+                          {progress.fps ? ` · ${progress.fps} fps` : ""}
+                          {progress.eta_s != null ? ` · ETA ${Math.ceil(progress.eta_s)}s` : ""}
+                        </p>
+                      </div>
+                    )}
                   </div>
                 )}
               </div>
 
+              {liveAlerts.length > 0 && (
+                <div className="mt-4 p-4 bg-gray-800/50 rounded-lg border border-gray-700">
+                  <p className="text-white font-medium mb-2">Hazards detected ({liveAlerts.length})</p>
+                  <ul className="space-y-1 max-h-48 overflow-y-auto">
+                    {liveAlerts.map((a) => (
+                      <li key={a.event_id} className="text-sm text-gray-300">
+                        <span className={a.decision === "BRAKE_EMERGENCY" ? "text-red-400" : "text-orange-400"}>
+                          {a.decision}
+                        </span>{" "}
+                        {a.label} at {a.distance_m} m (frame {a.frame})
+                      </li>
+                    ))}
+                  </ul>
+                </div>
+              )}
+
               {results && (
                 <div className="mt-4 p-4 bg-gray-800/50 rounded-lg border border-gray-700">
                   {results.error ? (